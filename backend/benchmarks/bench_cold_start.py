@@ -0,0 +1,76 @@
+"""Worker cold-start benchmark.
+
+Spawns fresh interpreters that import the app and run its lifespan startup
+(warmup included) against fakeredis, the way each production worker starts.
+Reports median process wall time to ready, the import and warmup phases as
+the app measures them, and peak RSS per worker.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_cold_start --runs 10
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+CHILD = """
+import asyncio, json
+import fakeredis.aioredis
+from src.utils import redis as redis_utils
+redis_utils.create_redis_client = fakeredis.aioredis.FakeRedis
+from src.app import app
+from src.utils.metrics import STARTUP_SECONDS
+
+async def start():
+    async with app.router.lifespan_context(app):
+        phases = {
+            phase: STARTUP_SECONDS.labels(phase)._value.get()
+            for phase in ("import", "warmup")
+        }
+    return phases
+
+phases = asyncio.run(start())
+with open("/proc/self/status") as status:
+    for line in status:
+        if line.startswith("VmHWM:"):
+            phases["rss_mb"] = int(line.split()[1]) / 1024
+print(json.dumps(phases))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD], check=True, capture_output=True, text=True
+        ).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample["wall"] = time.perf_counter() - start
+        samples.append(sample)
+
+    print(f"{args.runs} cold starts (median)")
+    print(
+        f"process to ready: {statistics.median(s['wall'] for s in samples) * 1000:8.1f} ms"
+    )
+    print(
+        f"app import:       {statistics.median(s['import'] for s in samples) * 1000:8.1f} ms"
+    )
+    print(
+        f"lifespan warmup:  {statistics.median(s['warmup'] for s in samples) * 1000:8.1f} ms"
+    )
+    print(
+        f"peak RSS:         {statistics.median(s['rss_mb'] for s in samples):8.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
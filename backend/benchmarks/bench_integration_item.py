@@ -0,0 +1,115 @@
+"""Memory and serialization benchmark for IntegrationItem.
+
+Compares the slotted IntegrationItem against the previous __dict__-based
+class serialized through FastAPI's jsonable_encoder.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_integration_item [--items 100000]
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+from src.integrations.models import IntegrationItem, encode_items
+
+
+class LegacyIntegrationItem:
+    def __init__(
+        self,
+        id=None,
+        type=None,
+        directory=False,
+        parent_path_or_name=None,
+        parent_id=None,
+        name=None,
+        creation_time=None,
+        last_modified_time=None,
+        url=None,
+        children=None,
+        mime_type=None,
+        delta=None,
+        drive_id=None,
+        visibility=True,
+        email=None,
+    ):
+        self.id = id
+        self.type = type
+        self.directory = directory
+        self.parent_path_or_name = parent_path_or_name
+        self.parent_id = parent_id
+        self.name = name
+        self.creation_time = creation_time
+        self.last_modified_time = last_modified_time
+        self.url = url
+        self.children = children
+        self.mime_type = mime_type
+        self.delta = delta
+        self.drive_id = drive_id
+        self.visibility = visibility
+        self.email = email
+
+
+def build(cls, count):
+    # Shaped like HubspotService.create_integration_item output.
+    return [
+        cls(
+            id=str(i),
+            name=f"First{i} Last{i}",
+            email=f"user{i}@example.com",
+            creation_time="2023-01-01T00:00:00.000Z",
+            last_modified_time="2023-06-01T00:00:00.000Z",
+        )
+        for i in range(count)
+    ]
+
+
+def measure_memory(cls, count):
+    tracemalloc.start()
+    items = build(cls, count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return items, size / count
+
+
+def measure(label, func, count):
+    start = time.perf_counter()
+    payload = func()
+    elapsed = time.perf_counter() - start
+    print(
+        f"  {label:<34} {elapsed * 1000:9.1f} ms  "
+        f"{count / elapsed:12,.0f} items/s  {len(payload):>12,} bytes"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100_000)
+    count = parser.parse_args().items
+
+    legacy, legacy_bytes = measure_memory(LegacyIntegrationItem, count)
+    slotted, slotted_bytes = measure_memory(IntegrationItem, count)
+
+    print(f"IntegrationItem benchmark ({count:,} items)")
+    print("memory per item:")
+    print(f"  {'legacy (__dict__)':<34} {legacy_bytes:9.0f} B")
+    print(f"  {'slotted':<34} {slotted_bytes:9.0f} B")
+    print("serialization:")
+    measure(
+        "legacy jsonable_encoder + dumps",
+        lambda: json.dumps(jsonable_encoder(legacy)).encode("utf-8"),
+        count,
+    )
+    measure("slotted encode_items", lambda: encode_items(slotted), count)
+    measure(
+        "slotted to_json (NDJSON)",
+        lambda: b"\n".join(item.to_json() for item in slotted),
+        count,
+    )
+
+
+if __name__ == "__main__":
+    main()
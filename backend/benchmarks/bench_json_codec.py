@@ -0,0 +1,161 @@
+"""JSON codec benchmark: stdlib json vs orjson.
+
+Times the hops that go through src.utils.json_codec:
+
+- decoding one 100-result provider page (HubSpot contacts, Notion search),
+  against httpx's Response.json() as used before;
+- encoding and decoding a 50k-item /load response or Redis snapshot.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_json_codec [--items 50000] [--repeat 20]
+"""
+
+import argparse
+import json
+import time
+
+import httpx
+from src.integrations.models import IntegrationItem
+from src.utils import json_codec
+
+from .bench_integration_item import build
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def hubspot_page(count=100):
+    return {
+        "results": [
+            {
+                "id": str(i),
+                "properties": {
+                    "createdate": "2023-01-01T00:00:00.000Z",
+                    "email": f"user{i}@example.com",
+                    "firstname": f"First{i}",
+                    "hs_object_id": str(i),
+                    "lastmodifieddate": "2023-06-01T00:00:00.000Z",
+                    "lastname": f"Last{i}",
+                },
+                "createdAt": "2023-01-01T00:00:00.000Z",
+                "updatedAt": "2023-06-01T00:00:00.000Z",
+                "archived": False,
+            }
+            for i in range(count)
+        ],
+        "paging": {"next": {"after": str(count), "link": "https://api.hubapi.com/"}},
+    }
+
+
+def notion_page(count=100):
+    return {
+        "object": "list",
+        "results": [
+            {
+                "object": "page",
+                "id": f"5c6a2821-6bb1-4a7e-b6e1-{i:012d}",
+                "created_time": "2023-01-01T00:00:00.000Z",
+                "last_edited_time": "2023-06-01T00:00:00.000Z",
+                "created_by": {"object": "user", "id": "ee5f0f84-409a-440f"},
+                "last_edited_by": {"object": "user", "id": "ee5f0f84-409a-440f"},
+                "cover": None,
+                "icon": {"type": "emoji", "emoji": "\U0001f4c4"},
+                "parent": {"type": "workspace", "workspace": True},
+                "archived": False,
+                "properties": {
+                    "title": {
+                        "id": "title",
+                        "type": "title",
+                        "title": [
+                            {
+                                "type": "text",
+                                "text": {"content": f"Page {i}", "link": None},
+                                "annotations": {
+                                    "bold": False,
+                                    "italic": False,
+                                    "strikethrough": False,
+                                    "underline": False,
+                                    "code": False,
+                                    "color": "default",
+                                },
+                                "plain_text": f"Page {i}",
+                                "href": None,
+                            }
+                        ],
+                    }
+                },
+                "url": f"https://www.notion.so/Page-{i}",
+            }
+            for i in range(count)
+        ],
+        "next_cursor": "5c6a2821-6bb1-4a7e-b6e1-000000000100",
+        "has_more": True,
+    }
+
+
+def stdlib_dumps(obj):
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(label, results):
+    cells = "".join(f"{seconds * 1000:12.3f}" for seconds in results)
+    print(f"  {label:<32}{cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    codecs = [("stdlib", json.loads, stdlib_dumps)]
+    if orjson is not None:
+        codecs.append(("orjson", orjson.loads, orjson.dumps))
+    else:
+        print("orjson is not installed; only the stdlib codec is measured.")
+    print(f"active codec: {json_codec.BACKEND}; best of {args.repeat}, in ms")
+    print(f"  {'':<32}" + "".join(f"{name:>12}" for name, _, _ in codecs))
+
+    for name, page in (("hubspot", hubspot_page()), ("notion", notion_page())):
+        body = stdlib_dumps(page)
+        response = httpx.Response(
+            200, content=body, headers={"Content-Type": "application/json"}
+        )
+        print(f"{name} page, 100 results, {len(body):,} bytes")
+        report("httpx Response.json()", [timed(response.json, args.repeat)])
+        report(
+            "loads(response.content)",
+            [timed(lambda: loads(body), args.repeat) for _, loads, _ in codecs],
+        )
+
+    items = build(IntegrationItem, args.items)
+    dicts = [item.to_dict() for item in items]
+    body = stdlib_dumps(dicts)
+    print(f"{args.items:,}-item response, {len(body):,} bytes")
+    report(
+        "encode (dumps of to_dict list)",
+        [timed(lambda: dumps(dicts), max(args.repeat // 4, 1)) for *_, dumps in codecs],
+    )
+    report(
+        "decode (loads)",
+        [
+            timed(lambda: loads(body), max(args.repeat // 4, 1))
+            for _, loads, _ in codecs
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Offline load test for the integrations API.
+
+Starts the mock provider servers in-process, launches the app in a
+subprocess pointed at them, and drives the full OAuth flow plus a load
+(/authorize -> /oauth2callback -> /credentials -> /load) concurrently for
+every provider. Reports p50/p95/p99 latency per endpoint, how many loads
+came back partial (cut off by the deadline or missing a source), overall
+requests per second and the app's peak RSS.
+
+Run from the backend directory, against a local Redis:
+
+    python -m benchmarks.load_test --concurrency 50 --iterations 300
+
+or fully offline with fakeredis:
+
+    python -m benchmarks.load_test --fake-redis --throttle-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List
+from urllib.parse import parse_qsl, urlparse
+
+import httpx
+import uvicorn
+
+from .mock_providers import MockConfig, create_mock_app
+
+PROVIDERS = ["hubspot", "airtable", "notion"]
+
+TOKEN_PATHS = {
+    "hubspot": "/hubspot/oauth/v1/token",
+    "airtable": "/airtable/oauth2/v1/token",
+    "notion": "/notion/v1/oauth/token",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def app_environment(mock_url: str, notion_expand: bool) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["NOTION_EXPAND_CHILDREN"] = "true" if notion_expand else "false"
+    for provider in PROVIDERS:
+        prefix = provider.upper()
+        env[f"{prefix}_API_URL"] = f"{mock_url}/{provider}"
+        env[f"{prefix}_TOKEN_URL"] = f"{mock_url}{TOKEN_PATHS[provider]}"
+        env[f"{prefix}_HTTP2"] = "false"
+    return env
+
+
+def peak_rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("App did not start in time")
+
+
+def is_partial(response: httpx.Response) -> bool:
+    # Plain loads flag it in a header; streams in their trailing line.
+    if response.headers.get("X-Partial") == "true":
+        return True
+    if response.headers.get("Content-Type", "").startswith("application/x-ndjson"):
+        lines = response.content.rstrip().rsplit(b"\n", 1)
+        try:
+            last = json.loads(lines[-1]) if lines[-1] else None
+        except ValueError:
+            return False
+        return isinstance(last, dict) and bool(last.get("partial"))
+    return False
+
+
+async def timed(latencies, errors, partials, name, request):
+    # Returns None when the step failed (error status or a dropped
+    # connection), so the flow stops there instead of feeding the next step.
+    start = time.perf_counter()
+    try:
+        response = await request
+    except httpx.TransportError:
+        latencies[name].append(time.perf_counter() - start)
+        errors[name] += 1
+        return None
+    latencies[name].append(time.perf_counter() - start)
+    if response.status_code >= 400:
+        errors[name] += 1
+        return None
+    if is_partial(response):
+        partials[name] += 1
+    return response
+
+
+async def run_flow(client, provider, latencies, errors, partials, stream):
+    ids = {"user_id": f"user-{uuid.uuid4().hex}", "org_id": "bench-org"}
+    form = {"integration_type": provider, **ids}
+
+    response = await timed(
+        latencies, errors, partials, "authorize", client.post("/authorize", data=form)
+    )
+    if response is None:
+        return
+    state = dict(parse_qsl(urlparse(response.json()).query))["state"]
+    response = await timed(
+        latencies,
+        errors,
+        partials,
+        "oauth2callback",
+        client.get(
+            "/oauth2callback",
+            params={"integration_type": provider, "code": "bench", "state": state},
+        ),
+    )
+    if response is None:
+        return
+    response = await timed(
+        latencies,
+        errors,
+        partials,
+        "credentials",
+        client.post("/credentials", data=form),
+    )
+    if response is None:
+        return
+    await timed(
+        latencies,
+        errors,
+        partials,
+        f"load:{provider}",
+        client.post(
+            "/load",
+            data={
+                **form,
+                "credentials": response.text,
+                "stream": "true" if stream else "false",
+            },
+        ),
+    )
+
+
+async def drive(args, app_url: str, pid: int) -> None:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    partials: Dict[str, int] = defaultdict(int)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async with httpx.AsyncClient(
+        base_url=f"{app_url}/integrations", limits=limits, timeout=None
+    ) as client:
+
+        async def one(i: int) -> None:
+            async with semaphore:
+                provider = PROVIDERS[i % len(PROVIDERS)]
+                await run_flow(
+                    client, provider, latencies, errors, partials, args.stream
+                )
+
+        async with httpx.AsyncClient(base_url=app_url) as probe:
+            await wait_until_ready(probe)
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.iterations)))
+        elapsed = time.perf_counter() - start
+
+    total = sum(len(samples) for samples in latencies.values())
+    print(
+        f"{args.iterations} flows, concurrency {args.concurrency}, "
+        f"provider latency {args.latency_ms:g} ms, {args.records} records/provider"
+    )
+    print(
+        f"{'endpoint':<18}{'count':>7}{'errors':>8}{'partial':>9}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    )
+    for name in sorted(latencies):
+        samples = latencies[name]
+        print(
+            f"{name:<18}{len(samples):>7}{errors[name]:>8}{partials[name]:>9}"
+            f"{percentile(samples, 50) * 1000:>10.1f}"
+            f"{percentile(samples, 95) * 1000:>10.1f}"
+            f"{percentile(samples, 99) * 1000:>10.1f}"
+        )
+    print(f"throughput: {total / elapsed:.1f} req/s over {elapsed:.1f} s")
+    print(f"app peak RSS: {peak_rss_mb(pid):.1f} MB")
+
+
+async def main_async(args) -> None:
+    mock_port, app_port = free_port(), free_port()
+    mock_config = MockConfig(
+        latency_ms=args.latency_ms,
+        page_size=args.page_size,
+        records=args.records,
+        throttle_rate=args.throttle_rate,
+    )
+    mock_server = uvicorn.Server(
+        uvicorn.Config(
+            create_mock_app(mock_config),
+            host="127.0.0.1",
+            port=mock_port,
+            log_level="warning",
+        )
+    )
+    mock_task = asyncio.create_task(mock_server.serve())
+
+    command = [sys.executable, "-m", "benchmarks.serve_app", "--port", str(app_port)]
+    if args.fake_redis:
+        command.append("--fake-redis")
+    app_process = subprocess.Popen(
+        command,
+        env=app_environment(f"http://127.0.0.1:{mock_port}", args.notion_expand),
+    )
+    try:
+        await drive(args, f"http://127.0.0.1:{app_port}", app_process.pid)
+    finally:
+        app_process.terminate()
+        app_process.wait()
+        mock_server.should_exit = True
+        await mock_task
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=150)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--records", type=int, default=500)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--fake-redis", action="store_true")
+    parser.add_argument(
+        "--notion-expand",
+        action="store_true",
+        help="Expand every Notion page through /v1/blocks/{id}/children",
+    )
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Local stand-ins for the HubSpot, Airtable and Notion APIs.
+
+Serves the token endpoints and the listing endpoints the loaders call, under
+/hubspot, /airtable and /notion prefixes. Latency, page sizes, dataset size
+and 429 injection are configured through MockConfig.
+"""
+
+import asyncio
+import random
+import secrets
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 50.0
+    page_size: int = 100
+    records: int = 1000
+    tables_per_base: int = 5
+    throttle_rate: float = 0.0
+    retry_after: float = 0.1
+
+
+def create_mock_app(config: MockConfig) -> FastAPI:
+    app = FastAPI()
+
+    async def respond(payload: dict) -> JSONResponse:
+        if config.latency_ms:
+            await asyncio.sleep(config.latency_ms / 1000)
+        if config.throttle_rate and random.random() < config.throttle_rate:
+            return JSONResponse(
+                {"message": "rate limited"},
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after)},
+            )
+        return JSONResponse(payload)
+
+    def page_bounds(cursor: Optional[str], total: int, limit: Optional[int] = None):
+        start = int(cursor) if cursor else 0
+        end = min(start + (limit or config.page_size), total)
+        return start, end, str(end) if end < total else None
+
+    async def token(request: Request) -> JSONResponse:
+        return await respond(
+            {
+                "access_token": secrets.token_urlsafe(16),
+                "refresh_token": secrets.token_urlsafe(16),
+                "expires_in": 1800,
+                "token_type": "bearer",
+            }
+        )
+
+    app.post("/hubspot/oauth/v1/token")(token)
+    app.post("/airtable/oauth2/v1/token")(token)
+    app.post("/notion/v1/oauth/token")(token)
+
+    # Record i of every object type was last modified i seconds after this
+    # instant, so modification order matches id order.
+    modified_base = datetime(2023, 6, 1, tzinfo=timezone.utc)
+
+    def record(object_type: str, i: int) -> dict:
+        modified = (modified_base + timedelta(seconds=i)).isoformat()
+        modified = modified.replace("+00:00", ".000Z")
+        if object_type == "contacts":
+            properties = {
+                "firstname": f"First{i}",
+                "lastname": f"Last{i}",
+                "email": f"user{i}@example.com",
+                "lastmodifieddate": modified,
+            }
+        elif object_type == "deals":
+            properties = {"dealname": f"Deal {i}", "hs_lastmodifieddate": modified}
+        else:
+            properties = {"name": f"Company {i}", "hs_lastmodifieddate": modified}
+        properties.update(
+            {"createdate": "2023-01-01T00:00:00.000Z", "hs_object_id": str(i)}
+        )
+        return {
+            "id": str(i),
+            "properties": properties,
+            "createdAt": "2023-01-01T00:00:00.000Z",
+            "updatedAt": modified,
+        }
+
+    def records_page(
+        object_type: str,
+        after: Optional[str],
+        limit: Optional[int],
+        first: int = 0,
+        end: Optional[int] = None,
+        descending: bool = False,
+    ) -> dict:
+        end = config.records if end is None else min(end, config.records)
+        total = max(end - first, 0)
+        start, stop, next_after = page_bounds(after, total, limit)
+        ids = range(first + start, first + stop)
+        if descending:
+            ids = range(end - 1 - start, end - 1 - stop, -1)
+        payload = {
+            "total": total,
+            "results": [record(object_type, i) for i in ids],
+        }
+        if next_after:
+            payload["paging"] = {"next": {"after": next_after}}
+        return payload
+
+    @app.get("/hubspot/oauth/v1/access-tokens/{token}")
+    async def hubspot_token_info(token: str):
+        return await respond({"hub_id": 1234, "token": token, "expires_in": 1800})
+
+    @app.get("/hubspot/crm/v3/objects/{object_type}")
+    async def hubspot_objects(
+        object_type: str, after: Optional[str] = None, limit: int = 100
+    ):
+        return await respond(records_page(object_type, after, limit))
+
+    @app.post("/hubspot/crm/v3/objects/{object_type}/search")
+    async def hubspot_search(object_type: str, request: Request):
+        # Supports the modification-time GTE filter the delta sync sends and
+        # the hs_object_id ranges and sorts of the segmented export.
+        body = await request.json()
+        first, end = 0, None
+        for group in body.get("filterGroups", []):
+            for condition in group.get("filters", []):
+                value = int(condition["value"])
+                if condition["propertyName"] != "hs_object_id":
+                    since = datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+                    first = max(first, int((since - modified_base).total_seconds()))
+                elif condition["operator"] == "GTE":
+                    first = max(first, value)
+                elif condition["operator"] == "GT":
+                    first = max(first, value + 1)
+                elif condition["operator"] == "LT":
+                    end = value if end is None else min(end, value)
+        descending = any(
+            sort.get("direction") == "DESCENDING" for sort in body.get("sorts", [])
+        )
+        return await respond(
+            records_page(
+                object_type,
+                body.get("after"),
+                body.get("limit"),
+                first,
+                end,
+                descending,
+            )
+        )
+
+    @app.get("/airtable/v0/meta/bases")
+    async def airtable_bases(offset: Optional[str] = None):
+        start, end, next_offset = page_bounds(offset, config.records)
+        payload = {
+            "bases": [{"id": f"app{i}", "name": f"Base {i}"} for i in range(start, end)]
+        }
+        if next_offset:
+            payload["offset"] = next_offset
+        return await respond(payload)
+
+    @app.get("/airtable/v0/meta/bases/{base_id}/tables")
+    async def airtable_tables(base_id: str):
+        return await respond(
+            {
+                "tables": [
+                    {"id": f"tbl{base_id}{i}", "name": f"Table {i}"}
+                    for i in range(config.tables_per_base)
+                ]
+            }
+        )
+
+    # Notion pages form a tree: page 0 is at the workspace root and page i
+    # is a child of page (i - 1) // 10.
+    def notion_parent(i: int) -> dict:
+        if i == 0:
+            return {"type": "workspace", "workspace": True}
+        return {"type": "page_id", "page_id": f"page-{(i - 1) // 10}"}
+
+    def notion_children(i: int) -> range:
+        return range(i * 10 + 1, min(i * 10 + 11, config.records))
+
+    @app.post("/notion/v1/search")
+    async def notion_search(request: Request):
+        body = await request.json()
+        start, end, next_cursor = page_bounds(
+            body.get("start_cursor"), config.records, body.get("page_size")
+        )
+        results = [
+            {
+                "object": "page",
+                "id": f"page-{i}",
+                "created_time": "2023-01-01T00:00:00.000Z",
+                "last_edited_time": "2023-06-01T00:00:00.000Z",
+                "parent": notion_parent(i),
+                "properties": {
+                    "title": {
+                        "id": "title",
+                        "type": "title",
+                        "title": [{"text": {"content": f"Page {i}"}}],
+                    }
+                },
+            }
+            for i in range(start, end)
+        ]
+        return await respond(
+            {
+                "object": "list",
+                "results": results,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None,
+            }
+        )
+
+    @app.get("/notion/v1/blocks/{block_id}/children")
+    async def notion_block_children(block_id: str):
+        i = int(block_id.rsplit("-", 1)[-1])
+        results = [
+            {
+                "object": "block",
+                "id": f"page-{child}",
+                "type": "child_page",
+                "child_page": {"title": f"Page {child}"},
+                "has_children": bool(notion_children(child)),
+                "created_time": "2023-01-01T00:00:00.000Z",
+                "last_edited_time": "2023-06-01T00:00:00.000Z",
+            }
+            for child in notion_children(i)
+        ]
+        return await respond(
+            {
+                "object": "list",
+                "results": results,
+                "next_cursor": None,
+                "has_more": False,
+            }
+        )
+
+    return app
@@ -0,0 +1,30 @@
+"""Runs the integrations app under uvicorn for the load test.
+
+Provider URLs and other settings are taken from the environment, exactly as
+in production. With --fake-redis the Redis client is replaced by an
+in-process fakeredis instance (requires the fakeredis and lupa packages).
+"""
+
+import argparse
+
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--fake-redis", action="store_true")
+    args = parser.parse_args()
+
+    if args.fake_redis:
+        import fakeredis.aioredis
+        from src.utils import redis as redis_utils
+
+        redis_utils.create_redis_client = fakeredis.aioredis.FakeRedis
+
+    uvicorn.run("src.app:app", host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
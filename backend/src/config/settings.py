@@ -1,10 +1,16 @@
-from pydantic import BaseSettings
+from typing import Literal, Optional
+
+from pydantic import BaseSettings, root_validator
 
 
 class Settings(BaseSettings):
+    # Comma-separated integration types served by this deployment. Client
+    # credentials are only required for the providers listed here.
+    enabled_providers: str = "hubspot,airtable,notion"
+
     # HubSpot
-    hubspot_client_id: str
-    hubspot_client_secret: str
+    hubspot_client_id: Optional[str] = None
+    hubspot_client_secret: Optional[str] = None
     hubspot_redirect_uri: str = (
         "http://localhost:8000/integrations/oauth2callback?integration_type=hubspot"
     )
@@ -13,10 +19,23 @@ class Settings(BaseSettings):
     )
     hubspot_auth_url: str = "https://app.hubspot.com/oauth/authorize"
     hubspot_token_url: str = "https://api.hubapi.com/oauth/v1/token"
+    hubspot_api_url: str = "https://api.hubapi.com"
+    hubspot_http2: bool = True
+    hubspot_rate_limit: float = 10.0
+    hubspot_rate_limit_burst: int = 100
+    hubspot_request_timeout: float = 30.0
+    # Any of contacts,deals,companies. Each enabled object's read scope is
+    # added to hubspot_scopes; an object type the portal refuses is reported
+    # as a failed source and the rest of the load still returns.
+    hubspot_objects: str = "contacts"
+    hubspot_segmented_export: bool = False
+    hubspot_export_segments: int = 16
+    hubspot_export_concurrency: int = 4
+    hubspot_delta_sync: bool = True
 
     # Airtable
-    airtable_client_id: str
-    airtable_client_secret: str
+    airtable_client_id: Optional[str] = None
+    airtable_client_secret: Optional[str] = None
     airtable_redirect_uri: str = (
         "http://localhost:8000/integrations/oauth2callback?integration_type=airtable"
     )
@@ -25,19 +44,141 @@ class Settings(BaseSettings):
     )
     airtable_auth_url: str = "https://airtable.com/oauth2/v1/authorize"
     airtable_token_url: str = "https://airtable.com/oauth2/v1/token"
+    airtable_api_url: str = "https://api.airtable.com"
+    airtable_http2: bool = True
+    airtable_rate_limit: float = 50.0
+    airtable_rate_limit_burst: int = 50
+    airtable_request_timeout: float = 30.0
+    airtable_tables_concurrency: int = 5
 
     # Notion
-    notion_client_id: str
-    notion_client_secret: str
+    notion_client_id: Optional[str] = None
+    notion_client_secret: Optional[str] = None
     notion_redirect_uri: str = (
         "http://localhost:8000/integrations/oauth2callback?integration_type=notion"
     )
     notion_scopes: str = ""  # Notion doesn’t use scopes in the same way
     notion_auth_url: str = "https://api.notion.com/v1/oauth/authorize"
     notion_token_url: str = "https://api.notion.com/v1/oauth/token"
+    notion_api_url: str = "https://api.notion.com"
+    notion_http2: bool = True
+    notion_rate_limit: float = 3.0
+    notion_rate_limit_burst: int = 3
+    notion_request_timeout: float = 30.0
+    # /v1/search already returns every shared page and database with its
+    # parent, which is enough to build the tree. Expanding each node through
+    # its children (and each database through /query) costs a request per
+    # node at 3 req/s, so it is only worth it for unshared descendants.
+    notion_expand_children: bool = False
+    notion_expand_concurrency: int = 3
 
     redis_expiry: int = 600
 
+    # OAuth state. When stateless, the state is an HMAC-signed, expiring token
+    # carrying the user and the PKCE verifier (encrypted, which needs the
+    # cryptography package, or else derived from the nonce). Redis then only
+    # records used nonces, to reject replays.
+    oauth_stateless_state: bool = False
+    oauth_state_secret: Optional[str] = None
+    oauth_state_encrypt_verifier: bool = False
+
+    # Redis connectivity
+    redis_mode: Literal["standalone", "cluster", "sentinel"] = "standalone"
+    redis_host: str = "localhost"
+    redis_port: int = 6379
+    redis_db: int = 0
+    redis_username: Optional[str] = None
+    redis_password: Optional[str] = None
+    redis_sentinels: str = ""  # "host:port,host:port"
+    redis_sentinel_service_name: str = "mymaster"
+    redis_sentinel_password: Optional[str] = None
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 5.0
+    redis_socket_timeout: float = 5.0
+    redis_socket_connect_timeout: float = 2.0
+    redis_health_check_interval: int = 30
+    redis_use_hiredis: bool = True
+
+    # Provider retries on 429/5xx
+    rate_limit_max_retries: int = 5
+    rate_limit_backoff_base: float = 0.5
+    rate_limit_backoff_max: float = 30.0
+
+    # Background /load sync jobs
+    sync_job_workers: int = 4
+    sync_job_expiry: int = 3600
+
+    # Per-route request deadlines. Provider calls made while serving a request
+    # get whatever budget is left, capped by the provider's request timeout.
+    load_deadline: float = 60.0
+    oauth_callback_deadline: float = 15.0
+    deadline_grace: float = 1.0
+    disconnect_poll_interval: float = 0.5
+
+    # Identical concurrent /load calls (same service and access token) share
+    # one crawl: within a worker, and across workers through Redis.
+    single_flight: bool = True
+    single_flight_timeout: float = 60.0
+    single_flight_result_ttl: float = 5.0
+
+    # Filtered /load queries are answered from an in-memory index of the
+    # session's items (per worker), so later pages and searches make no
+    # provider calls until the index expires or a refresh is asked for.
+    items_index_ttl: float = 300.0
+    items_index_max_sessions: int = 128
+    items_query_default_limit: int = 50
+    items_query_max_limit: int = 1000
+
+    # /load_batch
+    batch_provider_concurrency: int = 4
+    batch_deadline: float = 30.0
+
+    # Production server (python -m src.serve)
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: Optional[int] = None  # Defaults to one per CPU
+    startup_warmup: bool = True
+    startup_warmup_timeout: float = 5.0
+
+    # JSON codec: orjson when installed, unless forced to the stdlib
+    json_codec: Literal["auto", "stdlib"] = "auto"
+
+    # Metrics
+    event_loop_lag_interval: float = 0.5
+
+    # Stored tokens, refreshed shortly before they expire
+    credential_vault_expiry: int = 30 * 86400
+    token_refresh_margin: int = 300
+    token_refresh_lock_timeout: int = 30
+
+    # Cached /load results per (service, org_id, user_id, provider account).
+    # Delta revalidation cannot see deletions, so snapshots are rebuilt in
+    # full once the last full sync is older than items_cache_full_sync_age.
+    items_cache_ttl: int = 60
+    items_cache_snapshot_expiry: int = 86400
+    items_cache_full_sync_age: int = 6 * 3600
+    items_cache_max_bytes: int = 8 * 1024 * 1024
+
+    # Shared HTTP client pool (one per provider)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+
+    @root_validator(skip_on_failure=True)
+    def check_enabled_providers(cls, values):
+        for name in values["enabled_providers"].split(","):
+            name = name.strip().lower()
+            for field in (f"{name}_client_id", f"{name}_client_secret"):
+                if field in values and not values[field]:
+                    raise ValueError(f"{field} is required when {name} is enabled")
+        return values
+
+    @root_validator(skip_on_failure=True)
+    def check_state_secret(cls, values):
+        if values.get("oauth_stateless_state") and not values.get("oauth_state_secret"):
+            raise ValueError("oauth_state_secret is required for stateless state")
+        return values
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
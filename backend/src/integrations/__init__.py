@@ -1,5 +1,19 @@
-from .airtable import AirtableService
-from .hubspot import HubspotService
-from .notion import NotionService
+import importlib
+
+# Provider modules are imported on first attribute access, so importing the
+# package does not pull in every provider.
+_LAZY_EXPORTS = {
+    "AirtableService": ".airtable",
+    "HubspotService": ".hubspot",
+    "NotionService": ".notion",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        module = importlib.import_module(_LAZY_EXPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["AirtableService", "HubspotService", "NotionService"]
@@ -1,8 +1,11 @@
-import json
-from typing import List, Optional
+import asyncio
+from typing import AsyncIterator, List, Optional
 
-import requests
+from fastapi import HTTPException
 from src.config.settings import settings
+from src.utils.deadline import DeadlineExceeded
+from src.utils.failures import record_failure
+from src.utils.json_codec import loads
 
 from .models import IntegrationItem
 from .oauth import OAuthService
@@ -26,6 +29,11 @@ class AirtableService(OAuthService):
             redis_expiry=settings.redis_expiry,
             use_pkce=True,
             token_content_type="application/x-www-form-urlencoded",
+            http2=settings.airtable_http2,
+            rate_limit=settings.airtable_rate_limit,
+            rate_limit_burst=settings.airtable_rate_limit_burst,
+            request_timeout=settings.airtable_request_timeout,
+            api_url=settings.airtable_api_url,
         )
 
     def create_integration_item(
@@ -44,44 +52,80 @@ class AirtableService(OAuthService):
             parent_path_or_name=parent_name,
         )
 
-    def fetch_items(
-        self,
-        access_token: str,
-        url: str,
-        aggregated_response: List[dict],
-        offset: Optional[str] = None,
-    ) -> None:
-        params = {"offset": offset} if offset else {}
-        headers = {"Authorization": f"Bearer {access_token}"}
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code == 200:
-            results = response.json().get("bases", [])
-            aggregated_response.extend(results)
-            offset = response.json().get("offset")
-            if offset:
-                self.fetch_items(access_token, url, aggregated_response, offset)
+    def fetch_bases(self, access_token: str) -> AsyncIterator[List[dict]]:
+        return self.paginate(
+            "GET",
+            f"{settings.airtable_api_url}/v0/meta/bases",
+            results_key="bases",
+            cursor_path=("offset",),
+            cursor_param="offset",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
 
-    async def get_items(self, credentials: str) -> List[IntegrationItem]:
-        credentials_dict = json.loads(credentials)
-        access_token = credentials_dict.get("access_token")
-        url = "https://api.airtable.com/v0/meta/bases"
-        items = []
-        bases = []
-        self.fetch_items(access_token, url, bases)
-        for base in bases:
-            items.append(self.create_integration_item(base, "Base"))
-            tables_response = requests.get(
-                f"https://api.airtable.com/v0/meta/bases/{base.get('id')}/tables",
+    async def fetch_tables(
+        self, access_token: str, base: dict, semaphore: asyncio.Semaphore
+    ) -> List[IntegrationItem]:
+        async with semaphore:
+            response = await self.request(
+                "GET",
+                f"{settings.airtable_api_url}/v0/meta/bases/{base.get('id')}/tables",
+                endpoint="/v0/meta/bases/{base_id}/tables",
                 headers={"Authorization": f"Bearer {access_token}"},
             )
-            if tables_response.status_code == 200:
-                for table in tables_response.json()["tables"]:
-                    items.append(
-                        self.create_integration_item(
-                            table, "Table", base.get("id"), base.get("name")
-                        )
-                    )
-        return items
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail=response.text)
+        return [
+            self.create_integration_item(
+                table, "Table", base.get("id"), base.get("name")
+            )
+            for table in loads(response.content)["tables"]
+        ]
 
+    async def iter_items(
+        self, credentials: str
+    ) -> AsyncIterator[List[IntegrationItem]]:
+        credentials_dict = loads(credentials)
+        access_token = credentials_dict.get("access_token")
+
+        # Airtable allows 5 req/s per base; bound the fan-out across bases.
+        semaphore = asyncio.Semaphore(settings.airtable_tables_concurrency)
+        failures = []
+        expired = None
+        async for bases in self.fetch_bases(access_token):
+            tables_per_base = await asyncio.gather(
+                *(self.fetch_tables(access_token, base, semaphore) for base in bases),
+                return_exceptions=True,
+            )
+            items = []
+            for base, tables in zip(bases, tables_per_base):
+                items.append(self.create_integration_item(base, "Base"))
+                if isinstance(tables, HTTPException):
+                    # The other bases are still returned; the load is flagged
+                    # partial with this base's error.
+                    if not record_failure(
+                        f"{base.get('id')}_Base", tables.status_code, tables.detail
+                    ):
+                        failures.append((base.get("id"), tables))
+                elif isinstance(tables, DeadlineExceeded):
+                    expired = tables
+                elif isinstance(tables, BaseException):
+                    raise tables
+                else:
+                    items.extend(tables)
+            yield items
+            # Every fetch shares the deadline, so by now none is outstanding.
+            if expired:
+                raise expired
 
-airtable_service = AirtableService()
+        # Only reached when the caller is not collecting failures.
+        if failures:
+            raise HTTPException(
+                status_code=failures[0][1].status_code,
+                detail={
+                    "message": "Failed to fetch tables for some bases.",
+                    "bases": {
+                        base_id: {"status_code": exc.status_code, "detail": exc.detail}
+                        for base_id, exc in failures
+                    },
+                },
+            )
@@ -1,14 +1,70 @@
-import json
-from typing import List
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
 
-import requests
+import httpx
 from fastapi import HTTPException
 from src.config.settings import settings
+from src.utils.deadline import DeadlineExceeded
+from src.utils.failures import record_failure
+from src.utils.json_codec import loads
+from src.utils.redis import add_key_value_redis, get_value_redis
 
 from .models import IntegrationItem
 from .oauth import OAuthService
 
 
+class HubspotObject(NamedTuple):
+    name: str  # CRM object type, as used in /crm/v3/objects/{name}
+    item_type: Optional[str]
+    name_properties: Tuple[str, ...]
+    email_property: Optional[str]
+    modified_property: str
+    read_scope: str
+
+    @property
+    def properties(self) -> List[str]:
+        # Only what create_integration_item reads is requested.
+        fields = [*self.name_properties, self.modified_property]
+        if self.email_property:
+            fields.append(self.email_property)
+        return fields
+
+
+# Contacts keep no item type, so ids already stored for them stay stable.
+OBJECT_TYPES: Dict[str, HubspotObject] = {
+    "contacts": HubspotObject(
+        "contacts",
+        None,
+        ("firstname", "lastname"),
+        "email",
+        "lastmodifieddate",
+        "crm.objects.contacts.read",
+    ),
+    "deals": HubspotObject(
+        "deals",
+        "deal",
+        ("dealname",),
+        None,
+        "hs_lastmodifieddate",
+        "crm.objects.deals.read",
+    ),
+    "companies": HubspotObject(
+        "companies",
+        "company",
+        ("name",),
+        None,
+        "hs_lastmodifieddate",
+        "crm.objects.companies.read",
+    ),
+}
+CONTACTS = OBJECT_TYPES["contacts"]
+
+# The CRM search API will not page past this many results for one query.
+SEARCH_RESULT_LIMIT = 10000
+
+
 class HubspotService(OAuthService):
     service_name = "hubspot"
 
@@ -23,45 +79,384 @@ class HubspotService(OAuthService):
             redirect_uri=settings.hubspot_redirect_uri,
             auth_url=auth_url,
             token_url=settings.hubspot_token_url,
-            scopes=settings.hubspot_scopes,
+            scopes=self._scopes(),
             redis_expiry=settings.redis_expiry,
             use_pkce=True,
             token_content_type="application/x-www-form-urlencoded",
+            http2=settings.hubspot_http2,
+            rate_limit=settings.hubspot_rate_limit,
+            rate_limit_burst=settings.hubspot_rate_limit_burst,
+            request_timeout=settings.hubspot_request_timeout,
+            api_url=settings.hubspot_api_url,
         )
 
-    def create_integration_item(self, response_json: dict) -> IntegrationItem:
+    def _rate_limit_pause(self, response: httpx.Response) -> Optional[float]:
+        pause = super()._rate_limit_pause(response)
+        if pause is not None:
+            return pause
+        headers = response.headers
+        if headers.get("X-HubSpot-RateLimit-Remaining") == "0":
+            interval = headers.get("X-HubSpot-RateLimit-Interval-Milliseconds", "10000")
+            return int(interval) / 1000
+        if headers.get("X-HubSpot-RateLimit-Secondly-Remaining") == "0":
+            return 1.0
+        return None
+
+    def create_integration_item(
+        self, response_json: dict, hubspot_object: HubspotObject = CONTACTS
+    ) -> IntegrationItem:
         properties = response_json.get("properties", {})
+        name = " ".join(
+            properties.get(prop) or "" for prop in hubspot_object.name_properties
+        )
         return IntegrationItem(
             id=response_json.get("id", ""),
-            name=f"{properties.get('firstname', '')} {properties.get('lastname', '')}".strip(),
-            email=properties.get("email", ""),
+            type=hubspot_object.item_type,
+            name=name.strip(),
+            email=(
+                properties.get(hubspot_object.email_property, "")
+                if hubspot_object.email_property
+                else None
+            ),
             creation_time=response_json.get("createdAt", ""),
-            last_modified_time=response_json.get("lastmodifieddate", ""),
+            last_modified_time=properties.get(hubspot_object.modified_property)
+            or response_json.get("updatedAt", ""),
         )
 
-    async def get_items(self, credentials: str) -> List[IntegrationItem]:
-        credentials_dict = json.loads(credentials)
+    def _object_types(self) -> List[HubspotObject]:
+        return [
+            OBJECT_TYPES[name.strip()]
+            for name in settings.hubspot_objects.split(",")
+            if name.strip() in OBJECT_TYPES
+        ]
+
+    def _scopes(self) -> str:
+        # The configured scopes plus the read scope of every enabled object.
+        scopes = settings.hubspot_scopes.split()
+        for hubspot_object in self._object_types():
+            if hubspot_object.read_scope not in scopes:
+                scopes.append(hubspot_object.read_scope)
+        return " ".join(scopes)
+
+    def _skip_failed_object(
+        self, hubspot_object: HubspotObject, exc: HTTPException
+    ) -> None:
+        # The other object types are still returned; the load is flagged
+        # partial with this one's error.
+        if not record_failure(hubspot_object.name, exc.status_code, exc.detail):
+            raise exc
+
+    def _search(
+        self,
+        access_token: str,
+        hubspot_object: HubspotObject,
+        filters: List[Dict],
+        sort_property: str,
+    ) -> AsyncIterator[List[dict]]:
+        return self.paginate(
+            "POST",
+            f"{settings.hubspot_api_url}/crm/v3/objects/{hubspot_object.name}/search",
+            results_key="results",
+            cursor_path=("paging", "next", "after"),
+            cursor_param="after",
+            headers={"Authorization": f"Bearer {access_token}"},
+            json_body={
+                "filterGroups": [{"filters": filters}],
+                "sorts": [{"propertyName": sort_property, "direction": "ASCENDING"}],
+                "properties": hubspot_object.properties,
+                "limit": 100,
+            },
+            endpoint=f"/crm/v3/objects/{hubspot_object.name}/search",
+        )
+
+    async def iter_items(
+        self, credentials: str
+    ) -> AsyncIterator[List[IntegrationItem]]:
+        credentials_dict = loads(credentials)
         access_token = credentials_dict.get("access_token")
-        url = "https://api.hubapi.com/crm/v3/objects/contacts"
-        headers = {"Authorization": f"Bearer {access_token}"}
-        params = {"limit": 100, "properties": "firstname,lastname,emaixl"}
-        items = []
-        after = None
-        while True:
-            if after:
-                params["after"] = after
-            response = requests.get(url, headers=headers, params=params)
+        if settings.hubspot_segmented_export:
+            pages = self._export_segments(access_token)
+        else:
+            pages = self._list_objects(access_token)
+        async for page in pages:
+            yield page
+
+    async def _list_objects(
+        self, access_token: str
+    ) -> AsyncIterator[List[IntegrationItem]]:
+        for hubspot_object in self._object_types():
+            try:
+                async for results in self.paginate(
+                    "GET",
+                    f"{settings.hubspot_api_url}/crm/v3/objects/{hubspot_object.name}",
+                    results_key="results",
+                    cursor_path=("paging", "next", "after"),
+                    cursor_param="after",
+                    headers={"Authorization": f"Bearer {access_token}"},
+                    params={
+                        "limit": 100,
+                        "properties": ",".join(hubspot_object.properties),
+                    },
+                    endpoint=f"/crm/v3/objects/{hubspot_object.name}",
+                ):
+                    yield [
+                        self.create_integration_item(result, hubspot_object)
+                        for result in results
+                    ]
+            except HTTPException as exc:
+                self._skip_failed_object(hubspot_object, exc)
+
+    async def _export_segments(
+        self, access_token: str
+    ) -> AsyncIterator[List[IntegrationItem]]:
+        # Splits every object type into hs_object_id ranges and pages through
+        # the ranges concurrently. Ranges are disjoint and ids immutable, so
+        # the seen set only guards against a provider returning a record twice.
+        object_types = self._object_types()
+        bounds = await asyncio.gather(
+            *(self._id_bounds(access_token, obj) for obj in object_types),
+            return_exceptions=True,
+        )
+        segments = []
+        for hubspot_object, id_bounds in zip(object_types, bounds):
+            if isinstance(id_bounds, HTTPException):
+                self._skip_failed_object(hubspot_object, id_bounds)
+                continue
+            if isinstance(id_bounds, BaseException):
+                raise id_bounds
+            if id_bounds is None:
+                continue
+            low, high = id_bounds
+            step = -(-(high - low + 1) // settings.hubspot_export_segments)
+            segments.extend(
+                self._search_id_range(
+                    access_token, hubspot_object, start, min(start + step, high + 1)
+                )
+                for start in range(low, high + 1, step)
+            )
+
+        seen = set()
+        async for page in _merge_pages(segments, settings.hubspot_export_concurrency):
+            items = []
+            for item in page:
+                if (item.type, item.id) not in seen:
+                    seen.add((item.type, item.id))
+                    items.append(item)
+            yield items
+
+    async def _id_bounds(
+        self, access_token: str, hubspot_object: HubspotObject
+    ) -> Optional[Tuple[int, int]]:
+        ids = []
+        for direction in ("ASCENDING", "DESCENDING"):
+            response = await self.request(
+                "POST",
+                f"{settings.hubspot_api_url}/crm/v3/objects/{hubspot_object.name}/search",
+                idempotent=True,
+                endpoint=f"/crm/v3/objects/{hubspot_object.name}/search",
+                headers={"Authorization": f"Bearer {access_token}"},
+                json={
+                    "sorts": [{"propertyName": "hs_object_id", "direction": direction}],
+                    "properties": ["hs_object_id"],
+                    "limit": 1,
+                },
+            )
             if response.status_code != 200:
                 raise HTTPException(
                     status_code=response.status_code, detail=response.text
                 )
-            data = response.json()
-            for contact in data.get("results", []):
-                items.append(self.create_integration_item(contact))
-            after = data.get("paging", {}).get("next", {}).get("after")
-            if not after:
-                break
-        return items
+            results = loads(response.content).get("results")
+            if not results:
+                return None
+            ids.append(int(results[0]["id"]))
+        return ids[0], ids[1]
+
+    async def _search_id_range(
+        self, access_token: str, hubspot_object: HubspotObject, start: int, end: int
+    ) -> AsyncIterator[List[IntegrationItem]]:
+        # Pages through ids in [start, end), restarting after the last id seen
+        # whenever a query reaches SEARCH_RESULT_LIMIT.
+        try:
+            async for page in self._search_id_pages(
+                access_token, hubspot_object, start, end
+            ):
+                yield page
+        except HTTPException as exc:
+            self._skip_failed_object(hubspot_object, exc)
+
+    async def _search_id_pages(
+        self, access_token: str, hubspot_object: HubspotObject, start: int, end: int
+    ) -> AsyncIterator[List[IntegrationItem]]:
+        while True:
+            seen = 0
+            last_id = None
+            async for results in self._search(
+                access_token,
+                hubspot_object,
+                [
+                    {
+                        "propertyName": "hs_object_id",
+                        "operator": "GTE",
+                        "value": str(start),
+                    },
+                    {
+                        "propertyName": "hs_object_id",
+                        "operator": "LT",
+                        "value": str(end),
+                    },
+                ],
+                "hs_object_id",
+            ):
+                yield [
+                    self.create_integration_item(result, hubspot_object)
+                    for result in results
+                ]
+                seen += len(results)
+                if results:
+                    last_id = int(results[-1]["id"])
+                if seen >= SEARCH_RESULT_LIMIT:
+                    break
+
+            if seen < SEARCH_RESULT_LIMIT or last_id is None:
+                return
+            start = last_id + 1
+
+    async def iter_changes(
+        self, credentials: str, since: datetime
+    ) -> AsyncIterator[List[IntegrationItem]]:
+        credentials_dict = loads(credentials)
+        access_token = credentials_dict.get("access_token")
+        for hubspot_object in self._object_types():
+            try:
+                async for page in self._search_modified(
+                    access_token, hubspot_object, since
+                ):
+                    yield page
+            except HTTPException as exc:
+                self._skip_failed_object(hubspot_object, exc)
+
+    async def _search_modified(
+        self, access_token: str, hubspot_object: HubspotObject, since: datetime
+    ) -> AsyncIterator[List[IntegrationItem]]:
+        # Search results are capped at SEARCH_RESULT_LIMIT per query, so
+        # results are sorted by modification time and the query is restarted
+        # from the last timestamp seen whenever the cap is reached.
+        modified = hubspot_object.modified_property
+        while True:
+            seen = 0
+            last_modified = None
+            async for results in self._search(
+                access_token,
+                hubspot_object,
+                [
+                    {
+                        "propertyName": modified,
+                        "operator": "GTE",
+                        "value": str(_to_millis(since)),
+                    }
+                ],
+                modified,
+            ):
+                items = [
+                    self.create_integration_item(result, hubspot_object)
+                    for result in results
+                ]
+                yield items
+                seen += len(items)
+                if items:
+                    last_modified = _parse_time(items[-1].last_modified_time)
+                if seen >= SEARCH_RESULT_LIMIT:
+                    break
+
+            if (
+                seen < SEARCH_RESULT_LIMIT
+                or not last_modified
+                or last_modified <= since
+            ):
+                return
+            since = last_modified
+
+    @property
+    def supports_delta(self) -> bool:
+        return settings.hubspot_delta_sync
+
+    async def account_id(self, credentials: str) -> str:
+        # Snapshots are per portal, which outlives any one access token.
+        access_token = loads(credentials).get("access_token")
+        if not access_token:
+            raise HTTPException(
+                status_code=400, detail="credentials must include an access_token"
+            )
+        return await self._portal_id(access_token)
+
+    async def _portal_id(self, access_token: str) -> str:
+        token_hash = hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:16]
+        cache_key = f"hubspot_portal:{token_hash}"
+        portal_id = await get_value_redis(cache_key)
+        if portal_id:
+            return portal_id.decode("utf-8")
+
+        response = await self.request(
+            "GET",
+            f"{settings.hubspot_api_url}/oauth/v1/access-tokens/{access_token}",
+            endpoint="/oauth/v1/access-tokens/{token}",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail=response.text)
+        token_info = loads(response.content)
+        portal_id = str(token_info["hub_id"])
+        await add_key_value_redis(
+            cache_key,
+            portal_id,
+            expire=token_info.get("expires_in") or self.redis_expiry,
+        )
+        return portal_id
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _to_millis(value: Optional[datetime]) -> int:
+    return int(value.timestamp() * 1000) if value else 0
+
+
+async def _merge_pages(
+    sources: List[AsyncIterator[List[IntegrationItem]]], concurrency: int
+) -> AsyncIterator[List[IntegrationItem]]:
+    # Drains up to `concurrency` page iterators at once and yields pages as
+    # they arrive. If the deadline runs out, pages already fetched by the
+    # other sources are still yielded before DeadlineExceeded is re-raised.
+    queue: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(concurrency)
 
+    async def drain(source):
+        async with semaphore:
+            async for page in source:
+                queue.put_nowait(page)
 
-hubspot_service = HubspotService()
+    tasks = [asyncio.create_task(drain(source)) for source in sources]
+    for task in tasks:
+        task.add_done_callback(queue.put_nowait)
+    remaining = len(tasks)
+    expired = None
+    try:
+        while remaining:
+            entry = await queue.get()
+            if not isinstance(entry, asyncio.Task):
+                yield entry
+                continue
+            remaining -= 1
+            error = entry.exception()
+            if isinstance(error, DeadlineExceeded):
+                expired = error
+            elif error is not None:
+                raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+    if expired:
+        raise expired
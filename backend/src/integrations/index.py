@@ -0,0 +1,216 @@
+import base64
+import hashlib
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from src.utils.json_codec import dumps, loads
+
+from .models import IntegrationItem
+
+SORTABLE_FIELDS = ("id", "type", "name", "email", "creation_time", "last_modified_time")
+
+# (missing, value, type, id); see ItemIndex._sort_key.
+SortKey = Tuple[int, str, str, str]
+
+# Sorts after any character, so (prefix + _MAX_CHAR) bounds a prefix range.
+_MAX_CHAR = "\U0010ffff"
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+class ItemIndex:
+    """Read-only index over one load's items.
+
+    Hash indexes by id, parent_id and type, plus sorted (lowercased value,
+    position) arrays on name and email for prefix search. Results are ordered
+    by a sort field, then type and id, and paged with keyset cursors, so a
+    cursor stays valid on any worker's index of the same session.
+    """
+
+    def __init__(self, items: List[IntegrationItem], partial: bool = False):
+        self.items = items
+        self.partial = partial
+        self.by_id: Dict[str, List[int]] = defaultdict(list)
+        self.by_parent: Dict[str, List[int]] = defaultdict(list)
+        self.by_type: Dict[str, List[int]] = defaultdict(list)
+        for position, item in enumerate(items):
+            self.by_id[item.id].append(position)
+            self.by_parent[item.parent_id].append(position)
+            self.by_type[item.type].append(position)
+        self.names = sorted(
+            ((item.name or "").lower(), position) for position, item in enumerate(items)
+        )
+        self.emails = sorted(
+            (item.email.lower(), position)
+            for position, item in enumerate(items)
+            if item.email
+        )
+        # Sort keys and ascending orders per sort field, built on first use.
+        self._keys: Dict[str, List[SortKey]] = {}
+        self._orders: Dict[str, List[int]] = {}
+
+    @staticmethod
+    def _prefix(index: List[Tuple[str, int]], prefix: str) -> List[int]:
+        prefix = prefix.lower()
+        start = bisect_left(index, (prefix,))
+        end = bisect_left(index, (prefix + _MAX_CHAR,), start)
+        return [position for _, position in index[start:end]]
+
+    def search(
+        self,
+        item_id: Optional[str] = None,
+        item_type: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        name_prefix: Optional[str] = None,
+        email_prefix: Optional[str] = None,
+    ) -> Set[int]:
+        # Positions matching every filter. Each filter is answered by its own
+        # index, and the smallest candidate list is checked against the others.
+        candidates = []
+        if item_id is not None:
+            candidates.append(self.by_id.get(item_id, []))
+        if item_type is not None:
+            candidates.append(self.by_type.get(item_type, []))
+        if parent_id is not None:
+            candidates.append(self.by_parent.get(parent_id, []))
+        if name_prefix:
+            candidates.append(self._prefix(self.names, name_prefix))
+        if email_prefix:
+            candidates.append(self._prefix(self.emails, email_prefix))
+        if not candidates:
+            return set(range(len(self.items)))
+
+        candidates.sort(key=len)
+        others = [set(positions) for positions in candidates[1:]]
+        return {
+            position
+            for position in candidates[0]
+            if all(position in other for other in others)
+        }
+
+    @staticmethod
+    def _sort_key(item: IntegrationItem, field: str) -> SortKey:
+        # (missing, value, type, id): items without the field sort last (and
+        # so first when descending), and type and id make every key unique,
+        # so a key pins a cursor position.
+        value = getattr(item, field) if field else None
+        if field in ("name", "email"):
+            value = value.lower() if value else value
+        return (
+            0 if value else 1,
+            str(value or ""),
+            item.type or "",
+            item.id or "",
+        )
+
+    def _order(self, field: str) -> Tuple[List[int], List[SortKey]]:
+        if field not in self._orders:
+            keys = [self._sort_key(item, field) for item in self.items]
+            self._orders[field] = sorted(range(len(keys)), key=keys.__getitem__)
+            self._keys[field] = keys
+        return self._orders[field], self._keys[field]
+
+    def query(
+        self,
+        filters: Dict[str, Optional[str]],
+        fields: Optional[Sequence[str]] = None,
+        sort: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Dict:
+        if fields:
+            unknown = set(fields) - set(IntegrationItem.__slots__)
+            if unknown:
+                raise InvalidQuery(f"Unknown fields: {', '.join(sorted(unknown))}.")
+        sort = sort or ""
+        field = sort.lstrip("-")
+        if field and field not in SORTABLE_FIELDS:
+            raise InvalidQuery(f"Cannot sort by {field!r}.")
+        descending = sort.startswith("-")
+        query_hash = _query_hash(filters, sort)
+        after = _decode_cursor(cursor, query_hash) if cursor else None
+
+        # Without a sort field, results are ordered by type and id.
+        wanted = self.search(**filters)
+        order, keys = self._order(field)
+        matches = [position for position in order if position in wanted]
+        match_keys = [keys[position] for position in matches]
+        if descending:
+            end = len(matches) if after is None else bisect_left(match_keys, after)
+            page = matches[max(end - limit, 0) : end][::-1]
+            has_more = end - limit > 0
+        else:
+            start = 0 if after is None else bisect_right(match_keys, after)
+            page = matches[start : start + limit]
+            has_more = start + limit < len(matches)
+
+        items = [self.items[position].to_dict() for position in page]
+        if fields:
+            items = [{f: item[f] for f in fields if f in item} for item in items]
+        return {
+            "items": items,
+            "total": len(matches),
+            "next_cursor": (
+                _encode_cursor(keys[page[-1]], query_hash)
+                if page and has_more
+                else None
+            ),
+            "partial": self.partial,
+        }
+
+
+def _query_hash(filters: Dict[str, Optional[str]], sort: str) -> str:
+    # Ties a cursor to the filters and sort it was issued for.
+    query = dumps({"filters": filters, "sort": sort})
+    return hashlib.sha256(query).hexdigest()[:16]
+
+
+def _encode_cursor(after: SortKey, query_hash: str) -> str:
+    token = dumps({"after": list(after), "query": query_hash})
+    return base64.urlsafe_b64encode(token).decode("ascii")
+
+
+def _decode_cursor(cursor: str, query_hash: str) -> SortKey:
+    try:
+        data = loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        missing, value, item_type, item_id = data["after"]
+        after = (int(missing), str(value), str(item_type), str(item_id))
+        cursor_query = data["query"]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidQuery("Malformed cursor.")
+    if cursor_query != query_hash:
+        raise InvalidQuery("Cursor belongs to a different query.")
+    return after
+
+
+class ItemIndexCache:
+    # Per-session indexes kept in this worker, least recently used first out.
+
+    def __init__(self, max_sessions: int, ttl: float):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, ItemIndex]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[ItemIndex]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        built_at, index = entry
+        if time.monotonic() - built_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return index
+
+    def put(self, key: str, index: ItemIndex) -> None:
+        self._entries[key] = (time.monotonic(), index)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+
+
+__all__ = ["SORTABLE_FIELDS", "InvalidQuery", "ItemIndex", "ItemIndexCache"]
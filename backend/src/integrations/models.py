@@ -1,8 +1,29 @@
 from datetime import datetime
+from operator import attrgetter
 from typing import List, Optional
 
+from src.utils.json_codec import dumps
+
 
 class IntegrationItem:
+    __slots__ = (
+        "id",
+        "type",
+        "directory",
+        "parent_path_or_name",
+        "parent_id",
+        "name",
+        "creation_time",
+        "last_modified_time",
+        "url",
+        "children",
+        "mime_type",
+        "delta",
+        "drive_id",
+        "visibility",
+        "email",
+    )
+
     def __init__(
         self,
         id: Optional[str] = None,
@@ -36,3 +57,28 @@ class IntegrationItem:
         self.drive_id = drive_id
         self.visibility = visibility
         self.email = email
+
+    def to_dict(self) -> dict:
+        # Fetch every slot in a single C-level call and drop unset fields.
+        return {
+            name: value.isoformat() if isinstance(value, datetime) else value
+            for name, value in zip(self.__slots__, _get_fields(self))
+            if value is not None
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IntegrationItem":
+        return cls(**data)
+
+    def to_json(self) -> bytes:
+        return dumps(self.to_dict())
+
+    def __repr__(self) -> str:
+        return f"IntegrationItem({self.to_dict()!r})"
+
+
+_get_fields = attrgetter(*IntegrationItem.__slots__)
+
+
+def encode_items(items: List[IntegrationItem]) -> bytes:
+    return dumps([item.to_dict() for item in items])
@@ -1,9 +1,11 @@
-import json
-from typing import List, Optional
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
 
-import requests
 from fastapi import HTTPException
 from src.config.settings import settings
+from src.utils.deadline import DeadlineExceeded
+from src.utils.json_codec import loads
 
 from .models import IntegrationItem
 from .oauth import OAuthService
@@ -27,29 +29,31 @@ class NotionService(OAuthService):
             redis_expiry=settings.redis_expiry,
             use_pkce=False,
             token_content_type="application/json",
+            http2=settings.notion_http2,
+            rate_limit=settings.notion_rate_limit,
+            rate_limit_burst=settings.notion_rate_limit_burst,
+            request_timeout=settings.notion_request_timeout,
+            api_url=settings.notion_api_url,
         )
 
-    def _recursive_dict_search(self, data: dict, target_key: str) -> Optional[str]:
-        if target_key in data:
-            return data[target_key]
-        for value in data.values():
-            if isinstance(value, dict):
-                result = self._recursive_dict_search(value, target_key)
-                if result is not None:
-                    return result
-            elif isinstance(value, list):
-                for item in value:
-                    if isinstance(item, dict):
-                        result = self._recursive_dict_search(item, target_key)
-                        if result is not None:
-                            return result
-        return None
+    def _title(self, response_json: dict) -> Optional[str]:
+        # Pages keep their title in the one property of type "title";
+        # databases have it at the top level.
+        rich_text = response_json.get("title")
+        if rich_text is None:
+            for prop in response_json.get("properties", {}).values():
+                if prop.get("type") == "title":
+                    rich_text = prop.get("title")
+                    break
+        if not rich_text:
+            return None
+        return "".join(
+            segment.get("plain_text") or segment.get("text", {}).get("content", "")
+            for segment in rich_text
+        )
 
     def create_integration_item(self, response_json: dict) -> IntegrationItem:
-        name = (
-            self._recursive_dict_search(response_json.get("properties", {}), "content")
-            or response_json["object"] + " multi_select"
-        )
+        name = self._title(response_json) or response_json["object"] + " multi_select"
         parent_type = response_json.get("parent", {}).get("type", "")
         parent_id = (
             None
@@ -63,21 +67,176 @@ class NotionService(OAuthService):
             creation_time=response_json.get("created_time", ""),
             last_modified_time=response_json.get("last_edited_time", ""),
             parent_id=parent_id,
+            url=response_json.get("url"),
         )
 
-    async def get_items(self, credentials: str) -> List[IntegrationItem]:
-        credentials_dict = json.loads(credentials)
-        response = requests.post(
-            "https://api.notion.com/v1/search",
-            headers={
-                "Authorization": f"Bearer {credentials_dict.get('access_token')}",
-                "Notion-Version": "2022-06-28",
-            },
+    def create_child_block_item(self, block: dict, parent_id: str) -> IntegrationItem:
+        # child_page / child_database blocks describe a nested page or database.
+        object_type = "page" if block["type"] == "child_page" else "database"
+        return IntegrationItem(
+            id=block.get("id", ""),
+            type=object_type,
+            name=block[block["type"]].get("title") or f"{object_type} multi_select",
+            creation_time=block.get("created_time", ""),
+            last_modified_time=block.get("last_edited_time", ""),
+            parent_id=parent_id,
         )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        results = response.json().get("results", [])
-        return [self.create_integration_item(result) for result in results]
 
+    def _headers(self, credentials: str) -> dict:
+        credentials_dict = loads(credentials)
+        return {
+            "Authorization": f"Bearer {credentials_dict.get('access_token')}",
+            "Notion-Version": "2022-06-28",
+        }
+
+    async def expand(
+        self, headers: dict, item: IntegrationItem, semaphore: asyncio.Semaphore
+    ) -> List[Tuple[IntegrationItem, bool]]:
+        # Returns the direct children of a page (child page/database blocks)
+        # or database (rows), each flagged with whether it may have children.
+        if item.type == "database":
+            pages = self.paginate(
+                "POST",
+                f"{settings.notion_api_url}/v1/databases/{item.id}/query",
+                results_key="results",
+                cursor_path=("next_cursor",),
+                cursor_param="start_cursor",
+                headers=headers,
+                json_body={"page_size": 100},
+                endpoint="/v1/databases/{id}/query",
+            )
+        else:
+            pages = self.paginate(
+                "GET",
+                f"{settings.notion_api_url}/v1/blocks/{item.id}/children",
+                results_key="results",
+                cursor_path=("next_cursor",),
+                cursor_param="start_cursor",
+                headers=headers,
+                params={"page_size": 100},
+                endpoint="/v1/blocks/{id}/children",
+            )
 
-notion_service = NotionService()
+        children = []
+        async with semaphore:
+            try:
+                async for results in pages:
+                    for result in results:
+                        if item.type == "database":
+                            children.append(
+                                (self.create_integration_item(result), False)
+                            )
+                        elif result.get("type") in ("child_page", "child_database"):
+                            children.append(
+                                (
+                                    self.create_child_block_item(result, item.id),
+                                    result.get("has_children", False)
+                                    or result["type"] == "child_database",
+                                )
+                            )
+            except HTTPException as exc:
+                # Children that are not shared with the integration are skipped.
+                if exc.status_code not in (403, 404):
+                    raise
+        return children
+
+    async def iter_items(
+        self, credentials: str
+    ) -> AsyncIterator[List[IntegrationItem]]:
+        headers = self._headers(credentials)
+        seen = set()
+        to_expand = []
+        async for results in self.paginate(
+            "POST",
+            f"{settings.notion_api_url}/v1/search",
+            results_key="results",
+            cursor_path=("next_cursor",),
+            cursor_param="start_cursor",
+            headers=headers,
+            json_body={"page_size": 100},
+        ):
+            items = [self.create_integration_item(result) for result in results]
+            for item in items:
+                seen.add(item.id)
+            to_expand.extend(items)
+            yield items
+
+        if not settings.notion_expand_children:
+            return
+
+        # Expand the tree level by level; each level's nodes run concurrently.
+        semaphore = asyncio.Semaphore(settings.notion_expand_concurrency)
+        while to_expand:
+            levels = await asyncio.gather(
+                *(self.expand(headers, item, semaphore) for item in to_expand),
+                return_exceptions=True,
+            )
+            to_expand = []
+            discovered = []
+            expired = None
+            for children in levels:
+                if isinstance(children, DeadlineExceeded):
+                    expired = children
+                    continue
+                if isinstance(children, BaseException):
+                    raise children
+                for child, expandable in children:
+                    if child.id in seen:
+                        continue
+                    seen.add(child.id)
+                    discovered.append(child)
+                    if expandable:
+                        to_expand.append(child)
+            if discovered:
+                yield discovered
+            # Keep what the level found before the deadline ran out.
+            if expired:
+                raise expired
+
+    def _link_tree(self, items: List[IntegrationItem]) -> List[IntegrationItem]:
+        # Links are rebuilt from parent_id alone, so items merged in from a
+        # delta sync (which arrive unlinked) and items that moved are handled.
+        for item in items:
+            item.children = None
+            item.directory = False
+            item.parent_path_or_name = None
+        by_id = {item.id: item for item in items}
+        for item in items:
+            parent = by_id.get(item.parent_id)
+            if parent is None:
+                continue
+            if parent.children is None:
+                parent.children = []
+            parent.children.append(item.id)
+            parent.directory = True
+            item.parent_path_or_name = parent.name
+        return items
+
+    async def iter_changes(
+        self, credentials: str, since: datetime
+    ) -> AsyncIterator[List[IntegrationItem]]:
+        # Search sorted by last_edited_time, newest first; stop at the first
+        # result that predates the last sync.
+        async for results in self.paginate(
+            "POST",
+            f"{settings.notion_api_url}/v1/search",
+            results_key="results",
+            cursor_path=("next_cursor",),
+            cursor_param="start_cursor",
+            headers=self._headers(credentials),
+            json_body={
+                "page_size": 100,
+                "sort": {"direction": "descending", "timestamp": "last_edited_time"},
+            },
+        ):
+            changed = [
+                result
+                for result in results
+                if datetime.fromisoformat(
+                    result["last_edited_time"].replace("Z", "+00:00")
+                )
+                >= since
+            ]
+            yield [self.create_integration_item(result) for result in changed]
+            if len(changed) < len(results):
+                break
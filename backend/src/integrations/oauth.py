@@ -1,14 +1,98 @@
 import asyncio
 import base64
 import hashlib
-import json
+import logging
+import random
 import secrets
-from typing import Dict
+import time
+import weakref
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import httpx
 from fastapi import HTTPException, Request
 from fastapi.responses import HTMLResponse
-from src.utils.redis import add_key_value_redis, delete_key_redis, get_value_redis
+from src.config.settings import settings
+from src.utils.deadline import (
+    DeadlineExceeded,
+    bound_timeout,
+    check_deadline,
+    deadline_expired,
+    sleep_within_deadline,
+)
+from src.utils.failures import has_failures
+from src.utils.json_codec import dumps, dumps_str, loads
+from src.utils.metrics import (
+    ITEMS_PAGES,
+    ITEMS_RETURNED,
+    PROVIDER_REQUEST_SECONDS,
+    PROVIDER_REQUESTS,
+    TOKEN_EXCHANGE_SECONDS,
+)
+from src.utils.redis import (
+    add_key_value_redis,
+    claim_key_redis,
+    delete_key_redis,
+    get_value_redis,
+    lock_redis,
+    pause_key_redis,
+    pop_state_redis,
+    pop_value_redis,
+    store_state_redis,
+    take_token_redis,
+    token_budget_redis,
+)
+from src.utils.signed_state import (
+    InvalidState,
+    decrypt_value,
+    derive_value,
+    encrypt_value,
+    sign_state,
+    verify_state,
+)
+
+from .models import IntegrationItem
+
+logger = logging.getLogger(__name__)
+
+# Seconds subtracted from the last sync time when asking a provider for
+# changes, so that clock skew between us and the provider cannot drop edits.
+DELTA_CLOCK_SKEW = 60
+
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+# Hashes of tokens the vault issued for a user, kept so a client holding a
+# token from before the last few refreshes is still recognised.
+VAULT_TOKEN_HISTORY = 10
+
+
+def _modified_at(item: IntegrationItem) -> Optional[float]:
+    value = item.last_modified_time
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _high_water_mark(items: List[IntegrationItem], default: float) -> float:
+    # Latest modification time the provider reported, by its own clock.
+    return max(
+        (modified for modified in map(_modified_at, items) if modified is not None),
+        default=default,
+    )
+
+
+def _token_hashes(tokens: Any) -> List[str]:
+    if not isinstance(tokens, dict):
+        return []
+    return [
+        hashlib.sha256(str(tokens[key]).encode("utf-8")).hexdigest()
+        for key in ("access_token", "refresh_token")
+        if tokens.get(key)
+    ]
 
 
 class OAuthService:
@@ -23,6 +107,11 @@ class OAuthService:
         redis_expiry: int = 600,
         use_pkce: bool = True,
         token_content_type: str = "application/x-www-form-urlencoded",
+        http2: bool = True,
+        rate_limit: float = 10.0,
+        rate_limit_burst: int = 10,
+        request_timeout: float = 30.0,
+        api_url: Optional[str] = None,
     ):
         self.client_id = client_id
         self.client_secret = client_secret
@@ -33,6 +122,206 @@ class OAuthService:
         self.redis_expiry = redis_expiry
         self.use_pkce = use_pkce  # Toggle PKCE support
         self.token_content_type = token_content_type  # Form-encoded or JSON
+        self.http2 = http2
+        self.rate_limit = rate_limit  # Requests per second, per access token
+        self.rate_limit_burst = rate_limit_burst
+        self.request_timeout = request_timeout  # Per call, before deadlines
+        self.api_url = api_url
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._refresh_locks = weakref.WeakValueDictionary()
+
+    def open_http_client(self) -> httpx.AsyncClient:
+        # One long-lived, keep-alive client per provider, shared by token
+        # exchanges and item loaders.
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.request_timeout,
+                limits=httpx.Limits(
+                    max_connections=settings.http_max_connections,
+                    max_keepalive_connections=settings.http_max_keepalive_connections,
+                    keepalive_expiry=settings.http_keepalive_expiry,
+                ),
+            )
+        return self._http_client
+
+    async def warm_up_http_client(self, timeout: float) -> None:
+        # Constructing the client opens nothing, so send a HEAD to each host
+        # the service talks to. That leaves one keep-alive connection (with
+        # its TLS handshake done) per host in the pool for the first request.
+        client = self.open_http_client()
+        origins = {
+            str(httpx.URL(url).copy_with(path="/", query=None, fragment=None))
+            for url in (self.api_url, self.token_url)
+            if url
+        }
+        for origin in origins:
+            try:
+                await client.head(origin, timeout=timeout)
+            except httpx.HTTPError as exc:
+                logger.warning(
+                    "Could not pre-open a %s connection to %s: %r",
+                    self.service_name,
+                    origin,
+                    exc,
+                )
+
+    async def close_http_client(self) -> None:
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self.open_http_client()
+
+    def _rate_limit_keys(self, authorization: str) -> Tuple[str, str]:
+        # Hash tag keeps both keys in one cluster slot for the Lua script.
+        token_hash = hashlib.sha256(authorization.encode("utf-8")).hexdigest()[:16]
+        tag = f"{{{self.service_name}:{token_hash}}}"
+        return f"ratelimit:{tag}", f"ratelimit_pause:{tag}"
+
+    def _retry_after(self, response: httpx.Response) -> Optional[float]:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is None:
+            return None
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+    def _rate_limit_pause(self, response: httpx.Response) -> Optional[float]:
+        # Seconds every caller sharing this token should back off for.
+        # Providers with their own rate-limit headers extend this.
+        return self._retry_after(response)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        idempotent: Optional[bool] = None,
+        endpoint: Optional[str] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        # Sends a provider request through the shared per-token bucket, and
+        # retries throttled or unavailable responses when it is safe to. Waits
+        # and the call itself are bounded by the current request deadline.
+        if idempotent is None:
+            idempotent = method in ("GET", "HEAD", "OPTIONS")
+        authorization = (kwargs.get("headers") or {}).get("Authorization", "")
+        key, pause_key = self._rate_limit_keys(authorization)
+        # Callers pass a templated endpoint when the path embeds ids.
+        endpoint = endpoint or httpx.URL(url).path
+
+        for attempt in range(settings.rate_limit_max_retries + 1):
+            wait = await take_token_redis(
+                key, pause_key, self.rate_limit, self.rate_limit_burst
+            )
+            if wait:
+                await sleep_within_deadline(wait)
+            kwargs["timeout"] = bound_timeout(self.request_timeout)
+            try:
+                response = await self._timed_request(method, url, endpoint, **kwargs)
+            except httpx.TimeoutException:
+                check_deadline()
+                raise HTTPException(
+                    status_code=504, detail=f"{self.service_name} request timed out."
+                )
+
+            pause = self._rate_limit_pause(response)
+            if pause:
+                await pause_key_redis(key, pause_key, self.rate_limit, pause)
+            if (
+                response.status_code not in RETRYABLE_STATUS_CODES
+                or not idempotent
+                or attempt == settings.rate_limit_max_retries
+            ):
+                return response
+            if not pause:
+                backoff = min(
+                    settings.rate_limit_backoff_max,
+                    settings.rate_limit_backoff_base * 2**attempt,
+                )
+                await sleep_within_deadline(backoff * random.uniform(0.5, 1.0))
+        return response
+
+    async def _timed_request(
+        self, method: str, url: str, endpoint: str, **kwargs
+    ) -> httpx.Response:
+        status = "error"
+        start = time.perf_counter()
+        try:
+            response = await self.http_client.request(method, url, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            PROVIDER_REQUESTS.labels(self.service_name, endpoint, status).inc()
+            PROVIDER_REQUEST_SECONDS.labels(
+                self.service_name, endpoint, status
+            ).observe(time.perf_counter() - start)
+
+    async def rate_limit_budget(self, credentials: str) -> Dict:
+        access_token = loads(credentials).get("access_token")
+        key, pause_key = self._rate_limit_keys(f"Bearer {access_token}")
+        available, paused_for = await token_budget_redis(
+            key, pause_key, self.rate_limit, self.rate_limit_burst
+        )
+        return {
+            "rate": self.rate_limit,
+            "burst": self.rate_limit_burst,
+            "available": available,
+            "paused_for": paused_for,
+        }
+
+    async def paginate(
+        self,
+        method: str,
+        url: str,
+        results_key: str,
+        cursor_path: Tuple[str, ...],
+        cursor_param: str,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        json_body: Optional[Dict[str, Any]] = None,
+        idempotent: bool = True,
+        endpoint: Optional[str] = None,
+    ) -> AsyncIterator[List[dict]]:
+        # Iteratively follows the provider cursor and yields one page of raw
+        # results at a time. The cursor is sent as a query param, or in the
+        # body when the endpoint takes a JSON body (e.g. Notion search).
+        params = dict(params or {})
+        json_body = dict(json_body) if json_body is not None else None
+        while True:
+            response = await self.request(
+                method,
+                url,
+                idempotent=idempotent,
+                endpoint=endpoint,
+                headers=headers,
+                params=params,
+                json=json_body,
+            )
+            if response.status_code != 200:
+                raise HTTPException(
+                    status_code=response.status_code, detail=response.text
+                )
+            data = loads(response.content)
+            yield data.get(results_key, [])
+
+            cursor = data
+            for key in cursor_path:
+                cursor = cursor.get(key) if isinstance(cursor, dict) else None
+            if not cursor:
+                break
+            if json_body is not None:
+                json_body[cursor_param] = cursor
+            else:
+                params[cursor_param] = cursor
 
     def _create_code_challenge(self, code_verifier: str) -> str:
         m = hashlib.sha256()
@@ -45,32 +334,44 @@ class OAuthService:
             "user_id": user_id,
             "org_id": org_id,
         }
-        encoded_state = encoded_state = base64.urlsafe_b64encode(
-            json.dumps(state_data).encode("utf-8")
-        ).decode("utf-8")
+        code_verifier = secrets.token_urlsafe(32) if self.use_pkce else None
 
-        auth_url = f"{self.auth_url}&state={encoded_state}"
-        if self.use_pkce:
-            code_verifier = secrets.token_urlsafe(32)
-            code_challenge = self._create_code_challenge(code_verifier)
-            auth_url += f"&code_challenge={code_challenge}&code_challenge_method=S256"
-            await add_key_value_redis(
-                f"{self.service_name}_verifier:{org_id}:{user_id}",
+        if settings.oauth_stateless_state:
+            # Nothing is stored: the signed state carries everything the
+            # callback needs, so concurrent logins cannot clobber each other.
+            encoded_state, code_verifier = self._sign_state(state_data, code_verifier)
+        else:
+            encoded_state = base64.urlsafe_b64encode(dumps(state_data)).decode("utf-8")
+            await store_state_redis(
+                f"{self.service_name}_state:{org_id}:{user_id}",
+                state_data["state"],
                 code_verifier,
                 expire=self.redis_expiry,
             )
 
+        auth_url = f"{self.auth_url}&state={encoded_state}"
+        if code_verifier:
+            code_challenge = self._create_code_challenge(code_verifier)
+            auth_url += f"&code_challenge={code_challenge}&code_challenge_method=S256"
+
         if self.scopes:
             auth_url += f"&scope={self.scopes}"
 
-        await add_key_value_redis(
-            f"{self.service_name}_state:{org_id}:{user_id}",
-            json.dumps(state_data),
-            expire=self.redis_expiry,
-        )
-
         return auth_url
 
+    def _sign_state(
+        self, state_data: Dict, code_verifier: Optional[str]
+    ) -> Tuple[str, Optional[str]]:
+        # The PKCE verifier either travels encrypted inside the state, or is
+        # derived from the nonce and never leaves the server.
+        secret = settings.oauth_state_secret
+        signed = {**state_data, "service": self.service_name}
+        if code_verifier and settings.oauth_state_encrypt_verifier:
+            signed["verifier"] = encrypt_value(code_verifier, secret)
+        elif code_verifier:
+            code_verifier = derive_value(state_data["state"], secret)
+        return sign_state(signed, secret, self.redis_expiry), code_verifier
+
     async def oauth2callback(self, request: Request) -> HTMLResponse:
         if request.query_params.get("error"):
 
@@ -85,21 +386,41 @@ class OAuthService:
             "code": code,
             "redirect_uri": self.redirect_uri,
         }
+        if self.use_pkce and code_verifier:
+            token_data["code_verifier"] = code_verifier
+
+        tokens = await self._request_tokens(token_data)
+        await asyncio.gather(
+            add_key_value_redis(
+                f"{self.service_name}_credentials:{org_id}:{user_id}",
+                dumps(tokens),
+                expire=self.redis_expiry,
+            ),
+            self._store_vault_tokens(user_id, org_id, tokens),
+        )
+
+        return HTMLResponse(
+            content="""
+            <html><script>window.close();</script></html>
+        """
+        )
+
+    async def _request_tokens(self, token_data: Dict[str, str]) -> Dict:
+        token_data = dict(token_data)
         headers = {"Content-Type": self.token_content_type}
 
         if self.token_content_type == "application/x-www-form-urlencoded":
             token_data.update(
                 {"client_id": self.client_id, "client_secret": self.client_secret}
             )
-            if self.use_pkce and code_verifier:
-                token_data["code_verifier"] = code_verifier.decode("utf-8")
         else:
             headers["Authorization"] = (
                 f"Basic {base64.b64encode(f'{self.client_id}:{self.client_secret}'.encode()).decode()}"
             )
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
+        start = time.perf_counter()
+        try:
+            response = await self.http_client.post(
                 self.token_url,
                 data=(
                     token_data
@@ -112,68 +433,313 @@ class OAuthService:
                     else None
                 ),
                 headers=headers,
+                timeout=bound_timeout(self.request_timeout),
             )
-            if response.status_code != 200:
-
-                raise HTTPException(
-                    status_code=response.status_code, detail=response.text
-                )
-
-            tokens = response.json()
-            await asyncio.gather(
-                delete_key_redis(f"{self.service_name}_state:{org_id}:{user_id}"),
-                (
-                    delete_key_redis(f"{self.service_name}_verifier:{org_id}:{user_id}")
-                    if self.use_pkce
-                    else asyncio.sleep(0)
-                ),
-            )
-            await add_key_value_redis(
-                f"{self.service_name}_credentials:{org_id}:{user_id}",
-                json.dumps(tokens),
-                expire=self.redis_expiry,
+        except httpx.TimeoutException:
+            check_deadline()
+            raise HTTPException(
+                status_code=504, detail=f"{self.service_name} token request timed out."
             )
+        TOKEN_EXCHANGE_SECONDS.labels(
+            self.service_name, token_data["grant_type"]
+        ).observe(time.perf_counter() - start)
+        if response.status_code != 200:
 
-        return HTMLResponse(
-            content="""
-            <html><script>window.close();</script></html>
-        """
-        )
+            raise HTTPException(status_code=response.status_code, detail=response.text)
+
+        return loads(response.content)
 
     async def _verify_state_match(self, request: Request):
+        if settings.oauth_stateless_state:
+            return await self._verify_signed_state(request)
+
         code = request.query_params.get("code")
         encoded_state = request.query_params.get("state")
-        state_data = json.loads(base64.urlsafe_b64decode(encoded_state).decode("utf-8"))
+        state_data = loads(base64.urlsafe_b64decode(encoded_state))
         user_id = state_data.get("user_id")
         org_id = state_data.get("org_id")
         original_state = state_data.get("state")
 
-        saved_state, code_verifier = await asyncio.gather(
-            get_value_redis(f"{self.service_name}_state:{org_id}:{user_id}"),
-            (
-                get_value_redis(f"{self.service_name}_verifier:{org_id}:{user_id}")
-                if self.use_pkce
-                else asyncio.sleep(0, result=None)
-            ),
+        # The nonce is compared and the pending login consumed in one step,
+        # so it is single-use and a mismatched state leaves it in place.
+        matched, code_verifier = await pop_state_redis(
+            f"{self.service_name}_state:{org_id}:{user_id}", str(original_state)
         )
-
-        if not saved_state or original_state != json.loads(saved_state).get("state"):
-
+        if not matched:
             raise HTTPException(status_code=400, detail="State does not match.")
+        if not self.use_pkce:
+            code_verifier = None
 
         return code, code_verifier, org_id, user_id
 
+    async def _verify_signed_state(self, request: Request):
+        # Signature and expiry are checked in-process; Redis is only asked to
+        # mark the nonce as used, so a state cannot be replayed.
+        secret = settings.oauth_state_secret
+        try:
+            state_data = verify_state(request.query_params.get("state") or "", secret)
+            if state_data.get("service") != self.service_name:
+                raise InvalidState("State was issued for another integration.")
+            code_verifier = None
+            if self.use_pkce and "verifier" in state_data:
+                code_verifier = decrypt_value(state_data["verifier"], secret)
+            elif self.use_pkce:
+                code_verifier = derive_value(state_data["state"], secret)
+        except InvalidState as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+        if not await claim_key_redis(
+            f"{self.service_name}_state_used:{state_data['state']}",
+            state_data["exp"] - time.time(),
+        ):
+            raise HTTPException(status_code=400, detail="State has already been used.")
+
+        return (
+            request.query_params.get("code"),
+            code_verifier,
+            state_data.get("org_id"),
+            state_data.get("user_id"),
+        )
+
     async def get_credentials(self, user_id: str, org_id: str) -> Dict:
-        credentials = await get_value_redis(
+        credentials = await pop_value_redis(
             f"{self.service_name}_credentials:{org_id}:{user_id}"
         )
         if not credentials:
 
             raise HTTPException(status_code=400, detail="No credentials found.")
 
-        credentials_dict = json.loads(credentials)
-        await delete_key_redis(f"{self.service_name}_credentials:{org_id}:{user_id}")
-        return credentials_dict
+        return loads(credentials)
+
+    async def _store_vault_tokens(
+        self,
+        user_id: str,
+        org_id: str,
+        tokens: Dict,
+        previous: Optional[Dict] = None,
+    ) -> None:
+        expires_in = tokens.get("expires_in")
+        token_hashes = _token_hashes(tokens)
+        if previous:
+            token_hashes += [
+                token_hash
+                for token_hash in previous.get("token_hashes", [])
+                if token_hash not in token_hashes
+            ]
+        vault_entry = {
+            "tokens": tokens,
+            "expires_at": time.time() + int(expires_in) if expires_in else None,
+            "token_hashes": token_hashes[: 2 * VAULT_TOKEN_HISTORY],
+        }
+        await add_key_value_redis(
+            f"{self.service_name}_vault:{org_id}:{user_id}",
+            dumps(vault_entry),
+            expire=settings.credential_vault_expiry,
+        )
+
+    async def _load_vault_entry(self, user_id: str, org_id: str) -> Optional[Dict]:
+        vault_entry = await get_value_redis(
+            f"{self.service_name}_vault:{org_id}:{user_id}"
+        )
+        return loads(vault_entry) if vault_entry else None
+
+    def _needs_refresh(self, vault_entry: Dict) -> bool:
+        expires_at = vault_entry.get("expires_at")
+        return (
+            expires_at is not None
+            and "refresh_token" in vault_entry["tokens"]
+            and expires_at - time.time() < settings.token_refresh_margin
+        )
+
+    async def get_vault_tokens(self, user_id: str, org_id: str) -> Optional[Dict]:
+        # Returns stored tokens, refreshing them shortly before they expire.
+        # Concurrent refreshes are collapsed into one: an in-process lock per
+        # key for coroutines, and a Redis lock across workers.
+        vault_entry = await self._load_vault_entry(user_id, org_id)
+        if vault_entry is None or not self._needs_refresh(vault_entry):
+            return vault_entry and vault_entry["tokens"]
+
+        lock_key = f"{self.service_name}_vault_lock:{org_id}:{user_id}"
+        local_lock = self._refresh_locks.setdefault(lock_key, asyncio.Lock())
+        async with local_lock, lock_redis(
+            lock_key,
+            timeout=settings.token_refresh_lock_timeout,
+            blocking_timeout=settings.token_refresh_lock_timeout,
+        ):
+            # Another coroutine or worker may have refreshed while we waited.
+            vault_entry = await self._load_vault_entry(user_id, org_id)
+            if vault_entry is None or not self._needs_refresh(vault_entry):
+                return vault_entry and vault_entry["tokens"]
+
+            refresh_token = vault_entry["tokens"]["refresh_token"]
+            tokens = await self._request_tokens(
+                {"grant_type": "refresh_token", "refresh_token": refresh_token}
+            )
+            tokens.setdefault("refresh_token", refresh_token)
+            await self._store_vault_tokens(user_id, org_id, tokens, vault_entry)
+            return tokens
+
+    async def resolve_credentials(
+        self, credentials: str, user_id: Optional[str], org_id: Optional[str]
+    ) -> str:
+        # Prefer the vault, which stays fresh, over the tokens the client holds,
+        # but only for a client that proves it was issued this user's tokens:
+        # user_id and org_id alone are not secrets.
+        if user_id and org_id:
+            try:
+                presented = set(_token_hashes(loads(credentials)))
+            except ValueError:
+                presented = set()
+            vault_entry = presented and await self._load_vault_entry(user_id, org_id)
+            if vault_entry and presented.intersection(
+                vault_entry.get("token_hashes") or _token_hashes(vault_entry["tokens"])
+            ):
+                tokens = await self.get_vault_tokens(user_id, org_id)
+                if tokens:
+                    return dumps_str(tokens)
+        return credentials
+
+    def iter_items(self, credentials: str) -> AsyncIterator[List[IntegrationItem]]:
+        raise NotImplementedError("Subclasses must define iter_items")
+
+    async def get_items(self, credentials: str) -> List[IntegrationItem]:
+        # Returns what was gathered if the request deadline runs out; callers
+        # check deadline_expired() and the collected failures to tell a
+        # partial result from a full one.
+        items = []
+        pages = 0
+        try:
+            async for page in self.iter_items(credentials):
+                items.extend(page)
+                pages += 1
+        except DeadlineExceeded:
+            pass
+        ITEMS_PAGES.labels(self.service_name).observe(pages)
+        ITEMS_RETURNED.labels(self.service_name).observe(len(items))
+        return self._link_tree(items)
+
+    def _link_tree(self, items: List[IntegrationItem]) -> List[IntegrationItem]:
+        # Providers whose items form a tree fill in the links between them
+        # here. Called on every full list, including after a delta merge.
+        return items
+
+    def iter_changes(
+        self, credentials: str, since: datetime
+    ) -> AsyncIterator[List[IntegrationItem]]:
+        # Providers that can list items modified after `since` override this
+        # so a stale cache can be revalidated without a full refetch.
+        raise NotImplementedError
+
+    @property
+    def supports_delta(self) -> bool:
+        return type(self).iter_changes is not OAuthService.iter_changes
+
+    async def account_id(self, credentials: str) -> str:
+        # Identifies the provider account the credentials belong to, so that
+        # re-authorizing as another account does not reuse its snapshot. It
+        # must derive from a secret the caller holds, since a cached snapshot
+        # is served without a provider call: a hash of the refresh token (which
+        # survives refreshes) or access token. Overrides must only return ids
+        # obtained by validating the token with the provider.
+        tokens = loads(credentials)
+        token = tokens.get("refresh_token") or tokens.get("access_token") or ""
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+    async def load_items(
+        self, credentials: str, user_id: str, org_id: str
+    ) -> List[IntegrationItem]:
+        account_id = await self.account_id(credentials)
+        cache_key = f"{self.service_name}_items:{org_id}:{user_id}:{account_id}"
+        cached = await get_value_redis(cache_key)
+        started_at = time.time()
+
+        if cached:
+            snapshot = loads(cached)
+            items = [IntegrationItem.from_dict(item) for item in snapshot["items"]]
+            age = started_at - snapshot["synced_at"]
+            if age < settings.items_cache_ttl:
+                return self._mark_delta(
+                    items, snapshot.get("high_water_mark", snapshot["synced_at"])
+                )
+            full_synced_at = snapshot.get("full_synced_at", snapshot["synced_at"])
+            full_sync_age = started_at - full_synced_at
+            if (
+                self.supports_delta
+                and full_sync_age < settings.items_cache_full_sync_age
+            ):
+                # Ask from the earlier of the provider's high-water mark and
+                # our sync start: edits made while the last crawl ran may
+                # carry times below the final mark, and provider search
+                # indexes lag, so the window also overlaps by the skew.
+                high_water_mark = snapshot.get("high_water_mark", snapshot["synced_at"])
+                since = datetime.fromtimestamp(
+                    min(high_water_mark, snapshot["synced_at"]) - DELTA_CLOCK_SKEW,
+                    tz=timezone.utc,
+                )
+                merged = {(item.type, item.id): item for item in items}
+                changed = []
+                try:
+                    async for page in self.iter_changes(credentials, since):
+                        changed.extend(page)
+                        merged.update(((item.type, item.id), item) for item in page)
+                except DeadlineExceeded:
+                    pass
+                high_water_mark = max(
+                    high_water_mark, _high_water_mark(changed, high_water_mark)
+                )
+                items = self._mark_delta(
+                    self._link_tree(list(merged.values())), high_water_mark
+                )
+                await self._cache_items(
+                    cache_key, items, started_at, full_synced_at, high_water_mark
+                )
+                return items
+
+        items = await self.get_items(credentials)
+        high_water_mark = _high_water_mark(items, started_at)
+        items = self._mark_delta(items, high_water_mark)
+        await self._cache_items(
+            cache_key, items, started_at, started_at, high_water_mark
+        )
+        return items
+
+    def _mark_delta(
+        self, items: List[IntegrationItem], high_water_mark: float
+    ) -> List[IntegrationItem]:
+        # For delta-capable providers, each item carries the snapshot's
+        # high-water mark (epoch milliseconds) as its sync token.
+        if self.supports_delta:
+            delta = str(int(high_water_mark * 1000))
+            for item in items:
+                item.delta = delta
+        return items
+
+    async def _cache_items(
+        self,
+        cache_key: str,
+        items: List[IntegrationItem],
+        synced_at: float,
+        full_synced_at: float,
+        high_water_mark: float,
+    ) -> None:
+        # A partial load must not pass for a complete snapshot.
+        if deadline_expired() or has_failures():
+            return
+        payload = dumps(
+            {
+                "synced_at": synced_at,
+                "full_synced_at": full_synced_at,
+                "high_water_mark": high_water_mark,
+                "items": [item.to_dict() for item in items],
+            }
+        )
+        if len(payload) > settings.items_cache_max_bytes:
+            await delete_key_redis(cache_key)
+            return
+        # Keep the snapshot past its TTL so it can be revalidated incrementally.
+        await add_key_value_redis(
+            cache_key, payload, expire=settings.items_cache_snapshot_expiry
+        )
 
     @property
     def service_name(self) -> str:
@@ -0,0 +1,80 @@
+from functools import lru_cache
+from importlib.metadata import EntryPoint, entry_points
+from typing import Dict, List, Optional
+
+from src.config.settings import settings
+
+from .oauth import OAuthService
+
+# Installed packages register extra providers under this entry-point group,
+# e.g. in their pyproject.toml:
+#
+#     [project.entry-points."integrations.providers"]
+#     salesforce = "acme_salesforce.service:SalesforceService"
+#
+# The value names an OAuthService subclass taking no constructor arguments.
+ENTRY_POINT_GROUP = "integrations.providers"
+
+# integration_type -> "module:ClassName" for the providers shipped here.
+BUILTIN_PROVIDERS: Dict[str, str] = {
+    "hubspot": "src.integrations.hubspot:HubspotService",
+    "airtable": "src.integrations.airtable:AirtableService",
+    "notion": "src.integrations.notion:NotionService",
+}
+
+_services: Dict[str, OAuthService] = {}
+
+
+def _installed_entry_points() -> List[EntryPoint]:
+    try:
+        return list(entry_points(group=ENTRY_POINT_GROUP))
+    except TypeError:  # Python < 3.10
+        return list(entry_points().get(ENTRY_POINT_GROUP, []))
+
+
+@lru_cache(maxsize=None)
+def available_providers() -> Dict[str, EntryPoint]:
+    # Only metadata is read here; provider modules are imported on first use.
+    providers = {
+        name: EntryPoint(name=name, value=value, group=ENTRY_POINT_GROUP)
+        for name, value in BUILTIN_PROVIDERS.items()
+    }
+    providers.update(
+        (entry_point.name.lower(), entry_point)
+        for entry_point in _installed_entry_points()
+    )
+    return providers
+
+
+def enabled_providers() -> List[str]:
+    available = available_providers()
+    return [
+        name.strip().lower()
+        for name in settings.enabled_providers.split(",")
+        if name.strip().lower() in available
+    ]
+
+
+def get_service(integration_type: str) -> Optional[OAuthService]:
+    # Imports the provider module and builds its service the first time its
+    # integration_type is requested.
+    integration_type = integration_type.lower()
+    service = _services.get(integration_type)
+    if service is None and integration_type in enabled_providers():
+        service_class = available_providers()[integration_type].load()
+        service = _services.setdefault(integration_type, service_class())
+    return service
+
+
+def loaded_services() -> List[OAuthService]:
+    return list(_services.values())
+
+
+__all__ = [
+    "ENTRY_POINT_GROUP",
+    "BUILTIN_PROVIDERS",
+    "available_providers",
+    "enabled_providers",
+    "get_service",
+    "loaded_services",
+]
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import secrets
+from typing import Dict, Optional, Set
+
+from fastapi import HTTPException
+from src.config.settings import settings
+from src.utils.deadline import current_deadline
+from src.utils.failures import collect_failures
+from src.utils.json_codec import dumps, loads
+from src.utils.redis import (
+    add_key_value_redis,
+    append_values_redis,
+    get_range_redis,
+    get_value_redis,
+)
+
+from .oauth import OAuthService
+
+logger = logging.getLogger(__name__)
+
+
+# Runs provider crawls outside the request and stores results in Redis.
+# Jobs are asyncio tasks in the web worker, bounded by a semaphore so only
+# `sync_job_workers` crawls run at once while the rest wait queued. Status
+# and items live in Redis, so any worker can serve a job's progress.
+class SyncJobRunner:
+    def __init__(self, max_workers: int):
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def enqueue(self, service: OAuthService, credentials: str) -> Dict:
+        job_id = secrets.token_urlsafe(16)
+        status = {
+            "job_id": job_id,
+            "service": service.service_name,
+            "status": "queued",
+            "items": 0,
+            "pages": 0,
+        }
+        await self._save_status(status)
+        task = asyncio.create_task(self._run(status, service, credentials))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return dict(status)
+
+    async def get_status(self, job_id: str) -> Optional[Dict]:
+        status = await get_value_redis(f"sync_job:{job_id}")
+        return loads(status) if status else None
+
+    async def get_items(self, job_id: str, offset: int, limit: int) -> list:
+        return await get_range_redis(
+            f"sync_job_items:{job_id}", offset, offset + limit - 1
+        )
+
+    async def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _save_status(self, status: Dict) -> None:
+        await add_key_value_redis(
+            f"sync_job:{status['job_id']}",
+            dumps(status),
+            expire=settings.sync_job_expiry,
+        )
+
+    async def _run(self, status: Dict, service: OAuthService, credentials: str):
+        # Jobs outlive the request that enqueued them, and its deadline.
+        current_deadline.set(None)
+        items_key = f"sync_job_items:{status['job_id']}"
+        async with self._semaphore:
+            status["status"] = "running"
+            await self._save_status(status)
+            try:
+                with collect_failures() as failures:
+                    async for page in service.iter_items(credentials):
+                        if page:
+                            await append_values_redis(
+                                items_key,
+                                [item.to_json() for item in page],
+                                expire=settings.sync_job_expiry,
+                            )
+                        status["items"] += len(page)
+                        status["pages"] += 1
+                        await self._save_status(status)
+                status["status"] = "done"
+                if failures:
+                    status["partial"] = True
+                    status["failures"] = failures
+            except asyncio.CancelledError:
+                status["status"] = "cancelled"
+                await self._save_status(status)
+                raise
+            except HTTPException as exc:
+                status["status"] = "failed"
+                status["error"] = {"status_code": exc.status_code, "detail": exc.detail}
+            except Exception:
+                logger.exception("Sync job %s failed", status["job_id"])
+                status["status"] = "failed"
+                status["error"] = {"status_code": 500, "detail": "Sync job failed."}
+            await self._save_status(status)
+
+
+sync_jobs = SyncJobRunner(settings.sync_job_workers)
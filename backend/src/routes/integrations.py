@@ -1,15 +1,40 @@
-from typing import Any, Dict
+import asyncio
+import hashlib
+import logging
+import time
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, Form, HTTPException, Request
-from src.integrations import AirtableService, HubspotService, NotionService
+from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from src.config.settings import settings
+from src.integrations import registry
+from src.integrations.index import InvalidQuery, ItemIndex, ItemIndexCache
+from src.integrations.models import IntegrationItem, encode_items
+from src.integrations.sync import sync_jobs
+from src.utils.deadline import (
+    Deadline,
+    DeadlineExceeded,
+    bind_deadline,
+    deadline_expired,
+    deadline_scope,
+)
+from src.utils.failures import collect_failures
+from src.utils.json_codec import CodecJSONResponse, dumps, dumps_str, loads
+from src.utils.metrics import SERIALIZATION_SECONDS
+from src.utils.single_flight import FlightResult, SingleFlight
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
 
-services: Dict[str, Any] = {
-    "hubspot": HubspotService(),
-    "airtable": AirtableService(),
-    "notion": NotionService(),
-}
+router = APIRouter(default_response_class=CodecJSONResponse)
+
+# Coalesces identical concurrent non-streaming /load calls.
+load_flights = SingleFlight("load")
+
+# Per-session item indexes behind filtered /load queries.
+item_indexes = ItemIndexCache(
+    settings.items_index_max_sessions, settings.items_index_ttl
+)
 
 
 async def get_service(request: Request) -> Any:
@@ -23,7 +48,7 @@ async def get_service(request: Request) -> Any:
     if not integration_type:
         raise HTTPException(status_code=400, detail="Missing integration_type")
 
-    service = services.get(integration_type.lower())
+    service = registry.get_service(integration_type)
     if not service:
         raise HTTPException(status_code=400, detail="Invalid integration type")
 
@@ -42,7 +67,8 @@ async def authorize(
 
 @router.get("/oauth2callback")
 async def oauth2callback(request: Request, service: Any = Depends(get_service)):
-    return await service.oauth2callback(request)
+    with deadline_scope(settings.oauth_callback_deadline):
+        return await service.oauth2callback(request)
 
 
 @router.post("/credentials")
@@ -54,6 +80,368 @@ async def get_credentials(
     return await service.get_credentials(user_id, org_id)
 
 
-@router.post("/load")
-async def get_items(credentials: str = Form(...), service: Any = Depends(get_service)):
+async def load_service_items(
+    service: Any, credentials: str, user_id: Optional[str], org_id: Optional[str]
+) -> List[IntegrationItem]:
+    if user_id and org_id:
+        return await service.load_items(credentials, user_id, org_id)
     return await service.get_items(credentials)
+
+
+async def encode_service_items(
+    service: Any, credentials: str, user_id: Optional[str], org_id: Optional[str]
+) -> FlightResult:
+    with collect_failures() as failures:
+        items = await load_service_items(service, credentials, user_id, org_id)
+    start = time.perf_counter()
+    content = encode_items(items)
+    SERIALIZATION_SECONDS.labels(service.service_name).observe(
+        time.perf_counter() - start
+    )
+    return content, {
+        "partial": deadline_expired() or bool(failures),
+        "failures": failures,
+    }
+
+
+def partial_headers(meta: Dict) -> Optional[Dict[str, str]]:
+    if not meta["partial"]:
+        return None
+    headers = {"X-Partial": "true"}
+    if meta.get("failures"):
+        # e.g. "app1_Base=403,app2_Base=404"; details are left out of headers.
+        headers["X-Failed-Sources"] = ",".join(
+            f"{failure['source']}={failure['status_code']}"
+            for failure in meta["failures"]
+        )
+    return headers
+
+
+def load_flight_key(service: Any, credentials: str) -> str:
+    access_token = loads(credentials).get("access_token") or ""
+    token_hash = hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:16]
+    return f"{service.service_name}:{token_hash}"
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable) -> Any:
+    # Runs the work as a task (inheriting the request deadline) and cancels
+    # it if the client goes away before it finishes.
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait(
+                {task}, timeout=settings.disconnect_poll_interval
+            )
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise HTTPException(status_code=499, detail="Client disconnected.")
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+async def query_items(
+    request: Request,
+    service: Any,
+    credentials: str,
+    user_id: Optional[str],
+    org_id: Optional[str],
+    refresh: bool,
+    **query: Any,
+) -> Dict:
+    key = load_flight_key(service, credentials)
+    index = None if refresh else item_indexes.get(key)
+    if index is None:
+        with collect_failures() as failures:
+            items = await cancel_on_disconnect(
+                request, load_service_items(service, credentials, user_id, org_id)
+            )
+        index = ItemIndex(items, partial=deadline_expired() or bool(failures))
+        # A partial load would hide items from later pages; rebuild next time.
+        if not index.partial:
+            item_indexes.put(key, index)
+    try:
+        return index.query(**query)
+    except InvalidQuery as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+async def stream_items(
+    first_page: List[IntegrationItem],
+    pages: AsyncIterator[List[IntegrationItem]],
+    deadline: Deadline,
+    failures: List[Dict],
+) -> AsyncIterator[bytes]:
+    # The response body is produced after the route returns, so the request
+    # deadline and failure list are re-bound here. Starlette cancels the
+    # stream on disconnect.
+    with bind_deadline(deadline), collect_failures(failures):
+        try:
+            for item in first_page:
+                yield item.to_json() + b"\n"
+            async for page in pages:
+                for item in page:
+                    yield item.to_json() + b"\n"
+            if failures:
+                yield dumps({"failures": failures, "partial": True}) + b"\n"
+        except DeadlineExceeded:
+            error = {"status_code": 504, "detail": "Deadline exceeded."}
+            yield dumps({"error": error, "partial": True}) + b"\n"
+        except HTTPException as exc:
+            # Headers are already sent, so report late failures in-band.
+            error = {"status_code": exc.status_code, "detail": exc.detail}
+            yield dumps({"error": error}) + b"\n"
+
+
+@router.post("/load")
+async def get_items(
+    request: Request,
+    credentials: str = Form(...),
+    stream: bool = Form(False),
+    background: bool = Form(False),
+    user_id: Optional[str] = Form(None),
+    org_id: Optional[str] = Form(None),
+    item_id: Optional[str] = Form(None, alias="id"),
+    item_type: Optional[str] = Form(None, alias="type"),
+    parent_id: Optional[str] = Form(None),
+    name_prefix: Optional[str] = Form(None),
+    email_prefix: Optional[str] = Form(None),
+    fields: Optional[str] = Form(None),
+    sort: Optional[str] = Form(None),
+    limit: Optional[int] = Form(None, ge=1),
+    cursor: Optional[str] = Form(None),
+    refresh: bool = Form(False),
+    service: Any = Depends(get_service),
+):
+    filters = {
+        "item_id": item_id,
+        "item_type": item_type,
+        "parent_id": parent_id,
+        "name_prefix": name_prefix,
+        "email_prefix": email_prefix,
+    }
+    querying = any(
+        value is not None for value in (*filters.values(), fields, sort, limit, cursor)
+    )
+    if querying and (stream or background):
+        raise HTTPException(
+            status_code=400,
+            detail="Filters, fields, sort and paging cannot be combined with "
+            "stream or background.",
+        )
+
+    with deadline_scope(settings.load_deadline) as deadline:
+        credentials = await service.resolve_credentials(credentials, user_id, org_id)
+        if querying:
+            # Answered from the session's item index, built on first use.
+            return await query_items(
+                request,
+                service,
+                credentials,
+                user_id,
+                org_id,
+                refresh,
+                filters=filters,
+                fields=(
+                    [f.strip() for f in fields.split(",") if f.strip()]
+                    if fields
+                    else None
+                ),
+                sort=sort,
+                limit=min(
+                    limit or settings.items_query_default_limit,
+                    settings.items_query_max_limit,
+                ),
+                cursor=cursor,
+            )
+        if background:
+            return await sync_jobs.enqueue(service, credentials)
+        if not stream:
+            # Items gathered before the deadline are returned, flagged with
+            # an X-Partial header. Concurrent calls for the same service and
+            # access token share one load.
+            load = partial(encode_service_items, service, credentials, user_id, org_id)
+            if settings.single_flight:
+                key = load_flight_key(service, credentials)
+                result = load_flights.run(key, load)
+            else:
+                result = load()
+            content, meta = await cancel_on_disconnect(request, result)
+            return Response(
+                content=content,
+                media_type="application/json",
+                headers=partial_headers(meta),
+            )
+
+        # Pull the first page before responding so that auth and upstream
+        # errors still surface as a regular HTTP error status.
+        pages = service.iter_items(credentials)
+        with collect_failures() as failures:
+            try:
+                first_page = await pages.__anext__()
+            except StopAsyncIteration:
+                first_page = []
+    return StreamingResponse(
+        stream_items(first_page, pages, deadline, failures),
+        media_type="application/x-ndjson",
+    )
+
+
+# Process-wide caps on concurrent batch loads per provider.
+batch_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+async def load_batch_source(index: int, source: Dict, timeout: float) -> Dict:
+    integration_type = str(source.get("integration_type", "")).lower()
+    result = {"index": index, "integration_type": integration_type}
+    service = registry.get_service(integration_type)
+    if not service:
+        result["error"] = {"status_code": 400, "detail": "Invalid integration type"}
+        return result
+
+    credentials = source.get("credentials")
+    try:
+        parsed = loads(credentials) if isinstance(credentials, str) else credentials
+    except ValueError:
+        parsed = None
+    if not isinstance(parsed, dict) or not isinstance(parsed.get("access_token"), str):
+        result["error"] = {
+            "status_code": 400,
+            "detail": "credentials must be an object with an access_token",
+        }
+        return result
+    credentials = dumps_str(parsed)
+    user_id, org_id = source.get("user_id"), source.get("org_id")
+    semaphore = batch_semaphores.setdefault(
+        integration_type, asyncio.Semaphore(settings.batch_provider_concurrency)
+    )
+    try:
+        # Each source gets its own deadline so partial results are per source.
+        with deadline_scope(timeout) as deadline, collect_failures() as failures:
+            async with semaphore:
+                credentials = await service.resolve_credentials(
+                    credentials, user_id, org_id
+                )
+                items = await load_service_items(service, credentials, user_id, org_id)
+    except HTTPException as exc:
+        result["error"] = {"status_code": exc.status_code, "detail": exc.detail}
+        return result
+    except DeadlineExceeded:
+        result["error"] = {"status_code": 504, "detail": "Deadline exceeded."}
+        return result
+    result["items"] = [item.to_dict() for item in items]
+    if failures:
+        result["failures"] = failures
+    if deadline.expired or failures:
+        result["partial"] = True
+    return result
+
+
+@router.post("/load_batch")
+async def get_items_batch(
+    sources: str = Form(...), deadline: Optional[float] = Form(None)
+):
+    # sources: JSON list of {"integration_type", "credentials", "user_id"?,
+    # "org_id"?}. Sources are loaded concurrently under the deadline and
+    # return what they gathered by then; anything still running after a short
+    # grace period is cancelled and reported as timed out.
+    try:
+        sources_list = loads(sources)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="sources must be JSON")
+    if not isinstance(sources_list, list) or not all(
+        isinstance(source, dict) for source in sources_list
+    ):
+        raise HTTPException(
+            status_code=400, detail="sources must be a JSON list of objects"
+        )
+
+    timeout = min(deadline or settings.batch_deadline, settings.batch_deadline)
+    tasks = [
+        asyncio.create_task(load_batch_source(index, source, timeout))
+        for index, source in enumerate(sources_list)
+    ]
+    _, pending = (
+        await asyncio.wait(tasks, timeout=timeout + settings.deadline_grace)
+        if tasks
+        else ((), ())
+    )
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    results = []
+    for index, task in enumerate(tasks):
+        if task in pending:
+            results.append(
+                {
+                    "index": index,
+                    "integration_type": sources_list[index].get("integration_type"),
+                    "error": {"status_code": 504, "detail": "Deadline exceeded."},
+                }
+            )
+        elif task.exception() is not None:
+            logger.error("Batch source %s failed", index, exc_info=task.exception())
+            results.append(
+                {
+                    "index": index,
+                    "integration_type": sources_list[index].get("integration_type"),
+                    "error": {"status_code": 502, "detail": "Failed to load source."},
+                }
+            )
+        else:
+            results.append(task.result())
+    content = dumps(
+        {
+            "partial": any(
+                "error" in result or result.get("partial") for result in results
+            ),
+            "results": results,
+        }
+    )
+    return Response(content=content, media_type="application/json")
+
+
+@router.post("/rate_limit")
+async def get_rate_limit(
+    credentials: str = Form(...), service: Any = Depends(get_service)
+):
+    return await service.rate_limit_budget(credentials)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    status = await sync_jobs.get_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return status
+
+
+@router.get("/jobs/{job_id}/items")
+async def get_job_items(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    status = await sync_jobs.get_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    items = await sync_jobs.get_items(job_id, offset, limit)
+    next_offset = offset + len(items)
+    if not items and status["status"] in ("done", "failed", "cancelled"):
+        next_offset = None
+    # Items are stored pre-encoded, so splice them into the response as-is.
+    content = b"".join(
+        [
+            b'{"status":',
+            dumps(status),
+            b',"items":[',
+            b",".join(items),
+            b'],"next_offset":',
+            dumps(next_offset),
+            b"}",
+        ]
+    )
+    return Response(content=content, media_type="application/json")
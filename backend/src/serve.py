@@ -0,0 +1,56 @@
+"""Production entry point: N shared-nothing uvicorn workers.
+
+Run from the backend directory:
+
+    python -m src.serve --workers 4
+
+Each worker is a separate process with its own event loop (uvloop), HTTP
+parser (httptools), Redis pool and provider HTTP clients, all opened by the
+app lifespan before the worker accepts requests. Host, port and worker
+count default to SERVER_HOST, SERVER_PORT and SERVER_WORKERS (one per CPU).
+
+Under gunicorn, the equivalent is
+
+    gunicorn src.app:app -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8000
+
+(UvicornWorker picks uvloop and httptools when they are installed). In
+either case set PROMETHEUS_MULTIPROC_DIR to an empty directory so /metrics
+aggregates every worker; this script creates a temporary one if unset.
+Each worker reports its cold start as app_startup_seconds{phase=...}.
+"""
+
+import argparse
+import os
+import tempfile
+
+import uvicorn
+from src.config.settings import settings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument(
+        "--workers", type=int, default=settings.server_workers or os.cpu_count()
+    )
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if args.workers > 1 and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        # Must be set before the workers import prometheus_client.
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="metrics-")
+
+    uvicorn.run(
+        "src.app:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop",
+        http="httptools",
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+        self.expired = False
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def check(self) -> float:
+        remaining = self.remaining()
+        if remaining <= 0:
+            self.expired = True
+            raise DeadlineExceeded()
+        return remaining
+
+
+# The deadline of the request being served. Context variables are copied into
+# tasks created by gather/create_task, so fan-out work inherits it.
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar(
+    "current_deadline", default=None
+)
+
+
+@contextmanager
+def bind_deadline(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
+
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[Deadline]:
+    # Nested scopes can only shorten the budget of the enclosing one.
+    deadline = Deadline(seconds)
+    parent = current_deadline.get()
+    if parent is not None:
+        deadline.expires_at = min(deadline.expires_at, parent.expires_at)
+    with bind_deadline(deadline):
+        yield deadline
+
+
+def deadline_expired() -> bool:
+    deadline = current_deadline.get()
+    return deadline is not None and deadline.expired
+
+
+def check_deadline() -> None:
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def bound_timeout(timeout: float) -> float:
+    deadline = current_deadline.get()
+    if deadline is None:
+        return timeout
+    return min(timeout, deadline.check())
+
+
+async def sleep_within_deadline(seconds: float) -> None:
+    # Fail fast instead of sleeping past the deadline.
+    deadline = current_deadline.get()
+    if deadline is not None and seconds >= deadline.remaining():
+        deadline.expired = True
+        raise DeadlineExceeded()
+    await asyncio.sleep(seconds)
+
+
+__all__ = [
+    "Deadline",
+    "DeadlineExceeded",
+    "current_deadline",
+    "bind_deadline",
+    "deadline_scope",
+    "check_deadline",
+    "deadline_expired",
+    "bound_timeout",
+    "sleep_within_deadline",
+]
@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+# Parts of a load that failed while the rest carried on (e.g. one Airtable
+# base whose tables could not be read). Like the deadline, the list is shared
+# with tasks the load fans out to, and marks the result as partial.
+current_failures: ContextVar[Optional[List[Dict]]] = ContextVar(
+    "current_failures", default=None
+)
+
+
+@contextmanager
+def collect_failures(
+    failures: Optional[List[Dict]] = None,
+) -> Iterator[List[Dict]]:
+    # Pass an existing list to keep collecting into it, e.g. from a
+    # streaming response body that outlives the route.
+    failures = [] if failures is None else failures
+    token = current_failures.set(failures)
+    try:
+        yield failures
+    finally:
+        current_failures.reset(token)
+
+
+def record_failure(source: str, status_code: int, detail: Any) -> bool:
+    # Returns False when nobody is collecting, so the caller can fail instead.
+    failures = current_failures.get()
+    if failures is None:
+        return False
+    failures.append({"source": source, "status_code": status_code, "detail": detail})
+    return True
+
+
+def has_failures() -> bool:
+    return bool(current_failures.get())
+
+
+__all__ = ["current_failures", "collect_failures", "record_failure", "has_failures"]
@@ -0,0 +1,41 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from src.config.settings import settings
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib codec is used without it.
+    orjson = None
+
+# "orjson" when it is installed (unless JSON_CODEC=stdlib), else "stdlib".
+BACKEND = (
+    "orjson" if orjson is not None and settings.json_codec != "stdlib" else "stdlib"
+)
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+# dumps(obj) -> compact UTF-8 bytes; loads(bytes | str) -> object.
+if BACKEND == "orjson":
+    dumps = orjson.dumps
+    loads = orjson.loads
+else:
+    dumps = _stdlib_dumps
+    loads = json.loads
+
+
+def dumps_str(obj: Any) -> str:
+    return dumps(obj).decode("utf-8")
+
+
+class CodecJSONResponse(JSONResponse):
+    # ORJSONResponse when orjson is available, otherwise compact stdlib JSON.
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+__all__ = ["BACKEND", "dumps", "dumps_str", "loads", "CodecJSONResponse"]
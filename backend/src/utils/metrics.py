@@ -0,0 +1,122 @@
+import asyncio
+import os
+import time
+from functools import wraps
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from src.config.settings import settings
+
+PROVIDER_REQUESTS = Counter(
+    "provider_requests_total",
+    "HTTP requests sent to integration providers.",
+    ["service", "endpoint", "status"],
+)
+PROVIDER_REQUEST_SECONDS = Histogram(
+    "provider_request_seconds",
+    "Latency of HTTP requests sent to integration providers.",
+    ["service", "endpoint", "status"],
+)
+TOKEN_EXCHANGE_SECONDS = Histogram(
+    "token_exchange_seconds",
+    "Latency of OAuth token endpoint calls.",
+    ["service", "grant_type"],
+)
+ITEMS_PAGES = Histogram(
+    "get_items_pages",
+    "Provider pages fetched per get_items call.",
+    ["service"],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, float("inf")),
+)
+ITEMS_RETURNED = Histogram(
+    "get_items_items",
+    "Integration items returned per get_items call.",
+    ["service"],
+    buckets=(0, 10, 100, 1000, 10000, 100000, float("inf")),
+)
+SERIALIZATION_SECONDS = Histogram(
+    "load_serialization_seconds",
+    "Time spent encoding /load responses.",
+    ["service"],
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "redis_command_seconds",
+    "Latency of Redis helper calls.",
+    ["command"],
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds",
+    "Delay between when the event loop should wake up and when it does.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, float("inf")),
+)
+SINGLE_FLIGHT_CALLS = Counter(
+    "single_flight_calls_total",
+    "Coalesced calls, by whether they ran the work or shared another's result.",
+    ["flight", "role"],
+)
+STARTUP_SECONDS = Gauge(
+    "app_startup_seconds",
+    "Worker cold-start time, from importing the app to serving requests.",
+    ["phase"],
+    multiprocess_mode="max",
+)
+
+
+def time_redis_command(command):
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                REDIS_COMMAND_SECONDS.labels(command).observe(
+                    time.perf_counter() - start
+                )
+
+        return wrapper
+
+    return decorator
+
+
+async def monitor_event_loop_lag() -> None:
+    loop = asyncio.get_running_loop()
+    interval = settings.event_loop_lag_interval
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(loop.time() - start - interval, 0.0))
+
+
+def render_metrics() -> bytes:
+    # Aggregate across worker processes when prometheus multiprocess mode is on.
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+__all__ = [
+    "CONTENT_TYPE_LATEST",
+    "PROVIDER_REQUESTS",
+    "PROVIDER_REQUEST_SECONDS",
+    "TOKEN_EXCHANGE_SECONDS",
+    "ITEMS_PAGES",
+    "ITEMS_RETURNED",
+    "SERIALIZATION_SECONDS",
+    "REDIS_COMMAND_SECONDS",
+    "EVENT_LOOP_LAG_SECONDS",
+    "SINGLE_FLIGHT_CALLS",
+    "STARTUP_SECONDS",
+    "time_redis_command",
+    "monitor_event_loop_lag",
+    "render_metrics",
+]
@@ -1,24 +1,339 @@
-import os
+import asyncio
+from typing import Optional
 
 import redis.asyncio as redis
-from kombu.utils.url import safequote
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.connection import HiredisParser, PythonParser
+from redis.asyncio.sentinel import Sentinel
+from redis.utils import HIREDIS_AVAILABLE
+from src.config.settings import settings
+from src.utils.metrics import time_redis_command
 
-redis_host = safequote(os.environ.get("REDIS_HOST", "localhost"))
-redis_client = redis.Redis(host=redis_host, port=6379, db=0)
+redis_client: Optional[redis.Redis] = None
 
+# Shared token bucket. The bucket holds `tokens` as of time `ts`; tokens are
+# reserved even when the bucket is empty, and the caller sleeps for the
+# returned number of seconds, so waiting workers are served in arrival order.
+# A pause (set on 429s) moves `ts` to the end of the pause with one token, so
+# requests reserved during it are spaced out at `rate` from then on instead
+# of all going out together when it ends.
+# Floats are returned as strings because Lua numbers are truncated to integers.
+TAKE_TOKEN_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+local start = math.max(now, ts)
+tokens = math.min(capacity, tokens + (start - ts) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(start))
+local wait = start - now + math.max(-tokens, 0) / rate
+redis.call('EXPIRE', KEYS[1], math.ceil(wait + capacity / rate) + 1)
+return tostring(wait)
+"""
 
+PAUSE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local seconds = tonumber(ARGV[2])
+redis.call('SET', KEYS[2], 1, 'PX', math.max(math.floor(seconds * 1000), 1))
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local resume = now + seconds
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or 0
+local ts = tonumber(bucket[2]) or now
+-- Keep reservations that already run past the end of the pause.
+if ts + math.max(-tokens, 0) / rate < resume then
+    redis.call('HSET', KEYS[1], 'tokens', '1', 'ts', tostring(resume))
+    redis.call('EXPIRE', KEYS[1], math.ceil(seconds + 1 / rate) + 1)
+end
+return 1
+"""
+
+TOKEN_BUDGET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local pause = redis.call('PTTL', KEYS[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+return {tostring(tokens), tostring(math.max(pause, 0) / 1000)}
+"""
+
+# Single-flight: the leader takes the lock and clears the previous flight's
+# result in one step; on finishing it publishes the result as the only entry
+# of the flight stream, but only while it still owns the lock. Both keys share
+# a hash tag so the scripts work in cluster mode.
+CLAIM_FLIGHT_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    redis.call('DEL', KEYS[2])
+    return 1
+end
+return 0
+"""
+
+FINISH_FLIGHT_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('XADD', KEYS[2], 'MAXLEN', '1', '*', unpack(ARGV, 3))
+redis.call('PEXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+# A pending OAuth login is consumed only by a callback presenting its nonce,
+# so a forged callback cannot delete someone else's login. Returns the PKCE
+# verifier ('' when there is none), or false when the nonce does not match.
+POP_STATE_SCRIPT = """
+local values = redis.call('HMGET', KEYS[1], 'nonce', 'verifier')
+if not values[1] or values[1] ~= ARGV[1] then
+    return false
+end
+redis.call('DEL', KEYS[1])
+return values[2] or ''
+"""
+
+
+def _connection_kwargs() -> dict:
+    return {
+        "db": settings.redis_db,
+        "username": settings.redis_username,
+        "password": settings.redis_password,
+        "socket_timeout": settings.redis_socket_timeout,
+        "socket_connect_timeout": settings.redis_socket_connect_timeout,
+        "health_check_interval": settings.redis_health_check_interval,
+    }
+
+
+def _parser_class():
+    if settings.redis_use_hiredis and HIREDIS_AVAILABLE:
+        return HiredisParser
+    return PythonParser
+
+
+def create_redis_client() -> redis.Redis:
+    if settings.redis_mode == "cluster":
+        return RedisCluster(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            max_connections=settings.redis_max_connections,
+            **_connection_kwargs(),
+        )
+    if settings.redis_mode == "sentinel":
+        sentinels = [
+            (host, int(port))
+            for host, port in (
+                node.strip().rsplit(":", 1)
+                for node in settings.redis_sentinels.split(",")
+                if node.strip()
+            )
+        ]
+        sentinel = Sentinel(
+            sentinels,
+            socket_timeout=settings.redis_socket_timeout,
+            sentinel_kwargs={"password": settings.redis_sentinel_password},
+        )
+        return sentinel.master_for(
+            settings.redis_sentinel_service_name,
+            max_connections=settings.redis_max_connections,
+            parser_class=_parser_class(),
+            **_connection_kwargs(),
+        )
+    pool = redis.BlockingConnectionPool(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        parser_class=_parser_class(),
+        **_connection_kwargs(),
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+def get_redis_client() -> redis.Redis:
+    # Created on first use (normally the app lifespan), not at import time.
+    global redis_client
+    if redis_client is None:
+        redis_client = create_redis_client()
+    return redis_client
+
+
+async def init_redis() -> None:
+    get_redis_client()
+
+
+async def close_redis() -> None:
+    global redis_client
+    if redis_client is not None:
+        await redis_client.close()
+        if settings.redis_mode != "cluster":
+            await redis_client.connection_pool.disconnect()
+        redis_client = None
+
+
+def _pipeline():
+    # Cluster pipelines cannot span hash slots in a MULTI, so they are sent
+    # as plain (non-transactional) pipelines there.
+    return get_redis_client().pipeline(transaction=settings.redis_mode != "cluster")
+
+
+@time_redis_command("set")
 async def add_key_value_redis(key, value, expire=None):
-    await redis_client.set(key, value)
-    if expire:
-        await redis_client.expire(key, expire)
+    # SET ... EX is atomic, so the key is never left without a TTL.
+    await get_redis_client().set(key, value, ex=expire)
+
 
+@time_redis_command("store_state")
+async def store_state_redis(key, nonce, verifier=None, expire=None):
+    # One hash per pending login, so the nonce and verifier live and die
+    # together.
+    mapping = {"nonce": nonce}
+    if verifier:
+        mapping["verifier"] = verifier
+    async with _pipeline() as pipe:
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        if expire:
+            pipe.expire(key, expire)
+        await pipe.execute()
 
+
+@time_redis_command("get")
 async def get_value_redis(key):
-    return await redis_client.get(key)
+    return await get_redis_client().get(key)
+
 
+@time_redis_command("getdel")
+async def pop_value_redis(key):
+    return await get_redis_client().getdel(key)
 
+
+@time_redis_command("pop_state")
+async def pop_state_redis(key, nonce):
+    # (matched, verifier); nothing is deleted unless the nonce matches.
+    script = get_redis_client().register_script(POP_STATE_SCRIPT)
+    verifier = await script(keys=[key], args=[nonce])
+    if verifier is None:
+        return False, None
+    if isinstance(verifier, bytes):
+        verifier = verifier.decode("utf-8")
+    return True, verifier or None
+
+
+@time_redis_command("delete")
 async def delete_key_redis(key):
-    await redis_client.delete(key)
+    await get_redis_client().delete(key)
+
+
+@time_redis_command("append")
+async def append_values_redis(key, values, expire=None):
+    async with _pipeline() as pipe:
+        pipe.rpush(key, *values)
+        if expire:
+            pipe.expire(key, expire)
+        await pipe.execute()
+
+
+@time_redis_command("range")
+async def get_range_redis(key, start, end):
+    return await get_redis_client().lrange(key, start, end)
+
+
+@time_redis_command("take_token")
+async def take_token_redis(key, pause_key, rate, capacity):
+    script = get_redis_client().register_script(TAKE_TOKEN_SCRIPT)
+    return float(await script(keys=[key, pause_key], args=[rate, capacity]))
+
+
+@time_redis_command("token_budget")
+async def token_budget_redis(key, pause_key, rate, capacity):
+    script = get_redis_client().register_script(TOKEN_BUDGET_SCRIPT)
+    tokens, paused_for = await script(keys=[key, pause_key], args=[rate, capacity])
+    return float(tokens), float(paused_for)
+
+
+@time_redis_command("pause")
+async def pause_key_redis(key, pause_key, rate, seconds):
+    script = get_redis_client().register_script(PAUSE_SCRIPT)
+    await script(keys=[key, pause_key], args=[rate, seconds])
+
+
+@time_redis_command("claim")
+async def claim_key_redis(key, expire):
+    # SET NX: True only for the first caller, so the key works as a one-time
+    # token until it expires.
+    return bool(
+        await get_redis_client().set(key, 1, nx=True, px=max(int(expire * 1000), 1))
+    )
+
+
+@time_redis_command("claim_flight")
+async def claim_flight_redis(lock_key, stream_key, owner, timeout):
+    script = get_redis_client().register_script(CLAIM_FLIGHT_SCRIPT)
+    return bool(
+        await script(
+            keys=[lock_key, stream_key], args=[owner, max(int(timeout * 1000), 1)]
+        )
+    )
+
+
+@time_redis_command("finish_flight")
+async def finish_flight_redis(lock_key, stream_key, owner, fields, expire):
+    script = get_redis_client().register_script(FINISH_FLIGHT_SCRIPT)
+    args = [owner, max(int(expire * 1000), 1)]
+    for field, value in fields.items():
+        args.extend((field, value))
+    return bool(await script(keys=[lock_key, stream_key], args=args))
+
+
+@time_redis_command("wait_flight")
+async def wait_flight_redis(stream_key, timeout):
+    # Reads from the start of the stream, so a result published before the
+    # call is still seen. Blocks in slices shorter than the socket timeout.
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + timeout
+    while True:
+        remaining = give_up_at - loop.time()
+        if remaining <= 0:
+            return None
+        block = min(remaining, settings.redis_socket_timeout / 2)
+        entries = await get_redis_client().xread(
+            {stream_key: "0-0"}, count=1, block=max(int(block * 1000), 1)
+        )
+        if entries:
+            return entries[0][1][0][1]
+
+
+def lock_redis(key, timeout=None, blocking_timeout=None):
+    return get_redis_client().lock(
+        key, timeout=timeout, blocking_timeout=blocking_timeout
+    )
 
 
-__all__ = ["add_key_value_redis", "get_value_redis", "delete_key_redis"]
+__all__ = [
+    "add_key_value_redis",
+    "store_state_redis",
+    "get_value_redis",
+    "pop_value_redis",
+    "pop_state_redis",
+    "delete_key_redis",
+    "append_values_redis",
+    "get_range_redis",
+    "lock_redis",
+    "take_token_redis",
+    "token_budget_redis",
+    "pause_key_redis",
+    "claim_key_redis",
+    "claim_flight_redis",
+    "finish_flight_redis",
+    "wait_flight_redis",
+    "get_redis_client",
+    "init_redis",
+    "close_redis",
+]
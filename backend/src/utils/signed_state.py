@@ -0,0 +1,88 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Dict
+
+
+class InvalidState(Exception):
+    pass
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _signature(secret: str, payload: str) -> str:
+    digest = hmac.new(secret.encode("utf-8"), payload.encode("ascii"), hashlib.sha256)
+    return _b64encode(digest.digest())
+
+
+def sign_state(data: Dict, secret: str, expires_in: int) -> str:
+    # <base64url JSON>.<base64url HMAC-SHA256>, valid for expires_in seconds.
+    payload = _b64encode(
+        json.dumps(
+            {**data, "exp": int(time.time()) + expires_in}, separators=(",", ":")
+        ).encode("utf-8")
+    )
+    return f"{payload}.{_signature(secret, payload)}"
+
+
+def verify_state(token: str, secret: str) -> Dict:
+    payload, _, signature = token.partition(".")
+    if not signature or not hmac.compare_digest(signature, _signature(secret, payload)):
+        raise InvalidState("State signature does not match.")
+    try:
+        data = json.loads(_b64decode(payload))
+    except ValueError:
+        raise InvalidState("State is malformed.")
+    if not isinstance(data, dict) or data.get("exp", 0) < time.time():
+        raise InvalidState("State has expired.")
+    return data
+
+
+def _fernet(secret: str):
+    # cryptography is only needed when verifiers are encrypted into the state.
+    from cryptography.fernet import Fernet
+
+    key = hashlib.sha256(b"pkce-verifier:" + secret.encode("utf-8")).digest()
+    return Fernet(base64.urlsafe_b64encode(key))
+
+
+def encrypt_value(value: str, secret: str) -> str:
+    return _fernet(secret).encrypt(value.encode("utf-8")).decode("ascii")
+
+
+def decrypt_value(token: str, secret: str) -> str:
+    from cryptography.fernet import InvalidToken
+
+    try:
+        return _fernet(secret).decrypt(token.encode("ascii")).decode("utf-8")
+    except InvalidToken:
+        raise InvalidState("State verifier is invalid.")
+
+
+def derive_value(nonce: str, secret: str) -> str:
+    # Deterministic alternative to encryption: the value is recomputed from
+    # the nonce at callback time and never leaves the server.
+    digest = hmac.new(
+        secret.encode("utf-8"),
+        b"pkce-verifier:" + nonce.encode("utf-8"),
+        hashlib.sha256,
+    )
+    return _b64encode(digest.digest())
+
+
+__all__ = [
+    "InvalidState",
+    "sign_state",
+    "verify_state",
+    "encrypt_value",
+    "decrypt_value",
+    "derive_value",
+]
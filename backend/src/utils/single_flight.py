@@ -0,0 +1,126 @@
+import asyncio
+import secrets
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from src.config.settings import settings
+from src.utils.deadline import check_deadline, current_deadline
+from src.utils.json_codec import dumps, loads
+from src.utils.metrics import SINGLE_FLIGHT_CALLS
+from src.utils.redis import claim_flight_redis, finish_flight_redis, wait_flight_redis
+
+# A flight produces an encoded payload plus small JSON-serializable metadata.
+FlightResult = Tuple[bytes, Dict]
+
+
+class SingleFlight:
+    """Collapses identical concurrent calls into one.
+
+    Within a worker, callers with the same key await one shared task. Across
+    workers, the first task to claim the Redis lock runs the work and
+    publishes the result to a stream; the others wait on that stream. A
+    follower whose leader fails or disappears runs the work itself.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, asyncio.Future] = {}
+
+    async def run(
+        self, key: str, func: Callable[[], Awaitable[FlightResult]]
+    ) -> FlightResult:
+        future = self._flights.get(key)
+        if future is None:
+            # The shared task inherits this caller's context (and deadline),
+            # and is shielded so one caller going away does not cancel it.
+            future = asyncio.ensure_future(self._execute(key, func))
+            self._flights[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            SINGLE_FLIGHT_CALLS.labels(self.name, "local_follower").inc()
+        return await asyncio.shield(future)
+
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        if self._flights.get(key) is future:
+            del self._flights[key]
+        if not future.cancelled():
+            future.exception()  # Retrieved, even if every caller went away.
+
+    def _keys(self, key: str) -> Tuple[str, str]:
+        tag = f"{{{self.name}:{key}}}"
+        return f"flight_lock:{tag}", f"flight:{tag}"
+
+    async def _execute(
+        self, key: str, func: Callable[[], Awaitable[FlightResult]]
+    ) -> FlightResult:
+        lock_key, stream_key = self._keys(key)
+        owner = secrets.token_hex(8)
+        if await claim_flight_redis(
+            lock_key, stream_key, owner, settings.single_flight_timeout
+        ):
+            SINGLE_FLIGHT_CALLS.labels(self.name, "leader").inc()
+            return await self._lead(lock_key, stream_key, owner, func)
+
+        shared = await self._follow(stream_key)
+        if shared is not None:
+            SINGLE_FLIGHT_CALLS.labels(self.name, "remote_follower").inc()
+            return shared
+        # The leader failed or vanished; do the work here instead.
+        check_deadline()
+        SINGLE_FLIGHT_CALLS.labels(self.name, "fallback").inc()
+        return await func()
+
+    async def _lead(
+        self,
+        lock_key: str,
+        stream_key: str,
+        owner: str,
+        func: Callable[[], Awaitable[FlightResult]],
+    ) -> FlightResult:
+        try:
+            payload, meta = await func()
+        except HTTPException as exc:
+            error = {"status_code": exc.status_code, "detail": exc.detail}
+            await self._publish(
+                lock_key,
+                stream_key,
+                owner,
+                {"status": "error", "meta": dumps(error)},
+            )
+            raise
+        except Exception:
+            await self._publish(lock_key, stream_key, owner, {"status": "failed"})
+            raise
+
+        if len(payload) > settings.items_cache_max_bytes:
+            # Too large to pass through Redis; followers fetch their own.
+            fields = {"status": "failed"}
+        else:
+            fields = {"status": "done", "meta": dumps(meta), "payload": payload}
+        await self._publish(lock_key, stream_key, owner, fields)
+        return payload, meta
+
+    async def _publish(
+        self, lock_key: str, stream_key: str, owner: str, fields: Dict
+    ) -> None:
+        await finish_flight_redis(
+            lock_key, stream_key, owner, fields, settings.single_flight_result_ttl
+        )
+
+    async def _follow(self, stream_key: str) -> Optional[FlightResult]:
+        timeout = settings.single_flight_timeout
+        deadline = current_deadline.get()
+        if deadline is not None:
+            timeout = min(timeout, deadline.remaining())
+        fields = await wait_flight_redis(stream_key, timeout)
+        if fields is None:
+            return None
+        status = fields.get(b"status")
+        if status == b"done":
+            return fields[b"payload"], loads(fields[b"meta"])
+        if status == b"error":
+            raise HTTPException(**loads(fields[b"meta"]))
+        return None
+
+
+__all__ = ["FlightResult", "SingleFlight"]